@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Pack slices into one sprite atlas (MaxRects, best-short-side-fit).
+
+Each slice keeps its page bbox and additionally gets its position inside the
+atlas. Slices are surrounded by ``padding`` pixels of their own edge colour
+so scaling on device never samples a neighbouring slice.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from slice_assets import clamp_bbox, encode_spec
+
+Rect = Tuple[int, int, int, int]
+
+
+class MaxRectsBin:
+    """Free-rectangle list of one bin; ``insert`` returns (x, y) or None when full."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.free: List[Rect] = [(0, 0, width, height)]
+
+    def insert(self, w: int, h: int) -> Optional[Tuple[int, int]]:
+        best = None
+        for fx, fy, fw, fh in self.free:
+            if w <= fw and h <= fh:
+                dw, dh = fw - w, fh - h
+                score = (min(dw, dh), max(dw, dh), fy, fx)
+                if best is None or score < best:
+                    best = score
+        if best is None:
+            return None
+        x, y = best[3], best[2]
+        self._place((x, y, w, h))
+        return x, y
+
+    def _place(self, used: Rect):
+        ux, uy, uw, uh = used
+        out = []
+        for f in self.free:
+            fx, fy, fw, fh = f
+            if ux >= fx + fw or ux + uw <= fx or uy >= fy + fh or uy + uh <= fy:
+                out.append(f)
+                continue
+            # split the free rect into the (up to four) maximal parts around ``used``
+            if ux > fx:
+                out.append((fx, fy, ux - fx, fh))
+            if ux + uw < fx + fw:
+                out.append((ux + uw, fy, fx + fw - ux - uw, fh))
+            if uy > fy:
+                out.append((fx, fy, fw, uy - fy))
+            if uy + uh < fy + fh:
+                out.append((fx, uy + uh, fw, fy + fh - uy - uh))
+        self.free = [a for i, a in enumerate(out) if not any(
+            i != j and _contains(b, a) and (b != a or j < i) for j, b in enumerate(out))]
+
+
+def _contains(outer: Rect, inner: Rect) -> bool:
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and inner[0] + inner[2] <= outer[0] + outer[2] and inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+def _pack_width(sizes: Sequence[Tuple[int, int]], order: List[int], width: int):
+    packer = MaxRectsBin(width, sum(h for _, h in sizes))
+    pos = [None] * len(sizes)
+    for i in order:
+        pos[i] = packer.insert(*sizes[i])
+        if pos[i] is None:
+            return None
+    used_h = max(y + sizes[i][1] for i, (_, y) in enumerate(pos))
+    used_w = max(x + sizes[i][0] for i, (x, _) in enumerate(pos))
+    return pos, (used_w, used_h)
+
+
+def pack(sizes: Sequence[Tuple[int, int]], max_width: int = 2048):
+    """Place ``sizes`` (w, h) without overlap; returns ([(x, y)], (atlas_w, atlas_h)).
+
+    A few bin widths between the widest rect and ``max_width`` are tried and
+    the smallest resulting atlas wins.
+    """
+    if not sizes:
+        return [], (0, 0)
+    order = sorted(range(len(sizes)), key=lambda i: (-max(sizes[i]), -sizes[i][0] * sizes[i][1], i))
+    widest = max(w for w, _ in sizes)
+    side = math.sqrt(sum(w * h for w, h in sizes))
+    widths = {widest} | {int(side * k) for k in (1.0, 1.25, 1.5, 2.0)}
+    best = None
+    for width in sorted(w for w in widths if widest <= w <= max(max_width, widest)):
+        packed = _pack_width(sizes, order, width)
+        if packed is None:
+            continue
+        w, h = packed[1]
+        if best is None or (w * h, h) < (best[1][0] * best[1][1], best[1][1]):
+            best = packed
+    return best
+
+
+def _extruded(crop: Image.Image, padding: int) -> Image.Image:
+    if padding <= 0:
+        return crop
+    arr = np.asarray(crop)
+    pad = ((padding, padding), (padding, padding)) + ((0, 0),) * (arr.ndim - 2)
+    return Image.fromarray(np.pad(arr, pad, mode='edge'), crop.mode)
+
+
+def build_atlas(src, cache, slices: Iterable, name: str = 'atlas.png', padding: int = 2,
+                encode: Optional[dict] = None, max_width: int = 2048) -> Tuple[List[dict], Dict]:
+    """Pack ``slices`` ((name, bbox) pairs or {"name", "bbox"} dicts) into one atlas image.
+
+    Returns (meta, atlas): meta entries are like ``export_crops`` plus
+    ``"atlas": [x, y]``, the slice's offset inside the atlas; ``atlas`` is
+    {"name": file written, "size": [w, h]}. Empty slices are not packed.
+    """
+    W, H = src.size
+    meta = []
+    boxes = []
+    for s in slices:
+        sname, bbox = (s['name'], s['bbox']) if isinstance(s, dict) else s
+        x1, y1, x2, y2 = clamp_bbox(W, H, *bbox)
+        meta.append({"name": sname, "bbox": [int(x1), int(y1), int(x2 - x1), int(y2 - y1)]})
+        boxes.append((x1, y1, x2, y2))
+
+    packed = [i for i, m in enumerate(meta) if m['bbox'][2] > 0 and m['bbox'][3] > 0]
+    sizes = [(meta[i]['bbox'][2] + 2 * padding, meta[i]['bbox'][3] + 2 * padding) for i in packed]
+    positions, (aw, ah) = pack(sizes, max_width)
+    for i, (px, py) in zip(packed, positions):
+        meta[i]['atlas'] = [px + padding, py + padding]
+
+    spec = encode_spec(encode, name)
+    key = src.output_key(atlas=[boxes[i] for i in packed], padding=padding, max_width=max_width, encode=spec)
+    if not cache.is_fresh(name, key):
+        atlas = Image.new(src.image.mode, (aw, ah))
+        for i, (px, py) in zip(packed, positions):
+            atlas.paste(_extruded(src.image.crop(boxes[i]), padding), (px, py))
+        cache.save_image(name, key, atlas, spec)
+    return meta, {"name": cache.file_for(name), "size": [aw, ah]}
@@ -2,31 +2,24 @@
 import os, json
 from PIL import Image
 
+from color_mask import find_color_anchors
+
 IN_IMG = os.path.join('UIDESIGN', '登录页.png')
 CFG_PATH = os.path.join('scripts', 'interactive_config.json')
 
 def is_purple(r,g,b):
-    # 粗略紫色检测：蓝和红较高，绿较低
-    return r > 100 and b > 140 and g < 110 and (b - g) > 60
+    # 粗略紫色检测：蓝和红较高，绿较低（可直接作用于 numpy 通道数组）
+    return (r > 100) & (b > 140) & (g < 110) & ((b - g) > 60)
 
 def detect_largest_purple_rect(img):
     w,h = img.size
-    # 扫描下半区域，统计紫色像素的包围盒
+    # 扫描下半区域，取最大的连通紫色区域（零散紫色像素不会撑大按钮框）
     ymin = h//2
-    minx,miny,maxx,maxy = w, h, 0, 0
-    count = 0
-    px = img.load()
-    for y in range(ymin, h):
-        for x in range(0, w):
-            r,g,b = px[x,y]
-            if is_purple(r,g,b):
-                count += 1
-                if x < minx: minx = x
-                if y < miny: miny = y
-                if x > maxx: maxx = x
-                if y > maxy: maxy = y
-    if count < 500: # 防止误检
+    found = find_color_anchors(img, {'purple': is_purple}, region=[0, ymin, w, h - ymin], min_pixels=500)
+    if found['purple'] is None: # 防止误检
         return None
+    minx, miny, bw, bh = found['purple']['bbox']
+    maxx, maxy = minx + bw - 1, miny + bh - 1
     # 添加一些边距
     pad = 6
     minx = max(0, minx - pad)
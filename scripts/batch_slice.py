@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import os
+import sys
+import glob
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+import slice_login
+
+
+def collect_designs(patterns: List[str]) -> List[str]:
+    # a directory means every PNG directly inside it; anything else is a glob
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*.png'))
+        else:
+            matches = glob.glob(pattern)
+        found.extend(m for m in matches if os.path.isfile(m))
+    return sorted(set(found))
+
+
+def page_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def page_names(designs: List[str]) -> Dict[str, str]:
+    """Output name per design: its file stem, or its path below the common directory when stems clash."""
+    by_stem = defaultdict(list)
+    for path in designs:
+        by_stem[page_name(path)].append(path)
+    names = {}
+    for stem, paths in by_stem.items():
+        if len(paths) == 1:
+            names[paths[0]] = stem
+            continue
+        # same file name in different input directories: one output dir each
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+        for p in paths:
+            names[p] = os.path.relpath(os.path.splitext(os.path.abspath(p))[0], root)
+    return names
+
+
+def slice_one(in_path: str, out_dir: str, options: dict) -> Tuple[int, float]:
+    t0 = time.perf_counter()
+    meta = slice_login.slice_page(in_path, out_dir, **options)
+    return len(meta), time.perf_counter() - t0
+
+
+def run_batch(designs: List[str], out_root: str, workers: int = None, options: dict = None) -> List[dict]:
+    options = options or {}
+    names = page_names(designs)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(slice_one, path, os.path.join(out_root, names[path]), options): path
+            for path in designs
+        }
+        for fut in as_completed(futures):
+            path = futures[fut]
+            row = {"page": names[path], "input": path, "out_dir": os.path.join(out_root, names[path])}
+            try:
+                row["count"], row["seconds"] = fut.result()
+                print(f"[ok] {row['page']}: {row['count']} slices in {row['seconds']:.2f}s")
+            except Exception as e:
+                row["error"] = f"{type(e).__name__}: {e}"
+                print(f"[fail] {row['page']}: {row['error']}")
+            results.append(row)
+    results.sort(key=lambda r: r["page"])
+    return results
+
+
+def print_summary(results: List[dict], wall: float):
+    print()
+    print(f"{'page':<24} {'slices':>6} {'seconds':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['page']:<24} {'-':>6} {'failed':>8}")
+        else:
+            print(f"{r['page']:<24} {r['count']:>6} {r['seconds']:>8.2f}")
+    busy = sum(r.get("seconds", 0.0) for r in results)
+    print(f"pages: {len(results)}  page time: {busy:.2f}s  wall: {wall:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Slice every page design in one run.')
+    parser.add_argument('inputs', nargs='+', help='design directories or glob patterns, e.g. "UIDESIGN/*.png"')
+    parser.add_argument('output_root', help='each page is written to <output_root>/<page>/ '
+                        '(<dir>/<page>/ when pages in different directories share a name)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--element-size', type=int, default=3, help='dilation element size passed to find_candidate_boxes')
+    parser.add_argument('--min-fill', type=float, default=0.0, help='minimum component fill ratio')
+    parser.add_argument('--nms', default='greedy', choices=['greedy', 'containment', 'soft'],
+                        help='NMS mode; containment also drops boxes nested in a larger one')
+    parser.add_argument('--strip-height', type=int, default=None,
+                        help='process pages in strips of this many rows to bound memory on tall pages')
+    parser.add_argument('--pyramid', action='store_true',
+                        help='detect on a downsampled level and refine at full resolution (for @2x/@3x exports)')
+    args = parser.parse_args()
+
+    designs = collect_designs(args.inputs)
+    if not designs:
+        print(f"No designs matched: {' '.join(args.inputs)}")
+        sys.exit(2)
+
+    options = {"element_size": args.element_size, "min_fill": args.min_fill, "strip_height": args.strip_height,
+               "nms_mode": args.nms, "pyramid": args.pyramid}
+    t0 = time.perf_counter()
+    results = run_batch(designs, args.output_root, args.workers, options)
+    print_summary(results, time.perf_counter() - t0)
+    if any("error" in r for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Benchmark the slicing stages and gate on regressions against a baseline.
+
+Every stage runs on ``UIDESIGN/登录页.png`` and on synthetic designs of a few
+sizes. For each (case, stage) the best wall time of ``--repeat`` runs, the
+peak traced allocation (one extra run under tracemalloc) and a checksum of
+the output are recorded as JSON.
+
+With ``--baseline`` the run fails (exit 1) when a stage got slower than the
+baseline by more than ``--threshold`` (relative, and at least
+``--min-delta`` seconds so timer noise on tiny stages does not trip it),
+allocates more than ``--threshold`` above its baseline peak, or produces a
+different checksum.
+
+Usage:
+  python3 scripts/bench_slicing.py --save-baseline bench_baseline.json
+  python3 scripts/bench_slicing.py --baseline bench_baseline.json [--out result.json]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import build_cache
+import morphology
+import slice_interactive_login
+import slice_login
+from auto_align_interactive import detect_largest_purple_rect
+from slice_assets import export_crops
+
+REAL_PAGE = os.path.join('UIDESIGN', '登录页.png')
+SYNTHETIC_SIZES = [(375, 812), (786, 1704), (1572, 3408)]
+
+
+def synthetic_design(w: int, h: int, seed: int = 0) -> Image.Image:
+    """Deterministic page: soft gradient, cards, text-like bars and a purple button."""
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 1, h, dtype=np.float32)[:, None]
+    base = np.empty((h, w, 3), dtype=np.uint8)
+    base[:, :, 0] = (245 - 20 * y).astype(np.uint8)
+    base[:, :, 1] = (246 - 10 * y).astype(np.uint8)
+    base[:, :, 2] = 250
+    img = Image.fromarray(base)
+    draw = ImageDraw.Draw(img)
+    unit = w / 375.0
+    for _ in range(max(4, h // 120)):
+        x0 = int(rng.integers(0, w // 3))
+        y0 = int(rng.integers(0, h - 40))
+        x1 = min(w - 1, x0 + int(rng.integers(w // 4, w - x0)))
+        y1 = min(h - 1, y0 + int(rng.integers(int(30 * unit), int(160 * unit))))
+        fill = tuple(int(v) for v in rng.integers(180, 256, 3))
+        draw.rounded_rectangle([x0, y0, x1, y1], radius=int(12 * unit), fill=fill, outline=(200, 200, 210))
+        for ty in range(y0 + int(10 * unit), y1 - int(8 * unit), int(18 * unit)):
+            tw = int(rng.integers(int(40 * unit), max(int(41 * unit), x1 - x0 - int(20 * unit))))
+            draw.rectangle([x0 + int(10 * unit), ty, x0 + int(10 * unit) + tw, ty + int(6 * unit)], fill=(60, 60, 70))
+    bx0, by0 = int(40 * unit), int(h * 0.72)
+    draw.rounded_rectangle([bx0, by0, w - bx0, by0 + int(48 * unit)], radius=int(24 * unit), fill=(150, 60, 220))
+    return img
+
+
+def checksum(obj) -> str:
+    if isinstance(obj, np.ndarray):
+        data = str(obj.dtype).encode() + str(obj.shape).encode() + np.ascontiguousarray(obj).tobytes()
+    else:
+        data = json.dumps(obj, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def measure(fn: Callable, repeat: int) -> dict:
+    best = None
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"time": round(best, 6), "peak_bytes": int(peak), "checksum": checksum(out)}
+
+
+def dir_checksum(path: str) -> Dict[str, str]:
+    return {n: build_cache.file_hash(os.path.join(path, n))[:16] for n in sorted(os.listdir(path))}
+
+
+def stages_for(pil: Image.Image, tmp: str) -> List[Tuple[str, Callable]]:
+    img = np.array(pil.convert('RGB'))
+    gray = slice_login._to_gray(img)
+    edges = slice_login._edges_binary(gray)
+    element = morphology.structuring_element(3)
+    dilated = slice_login._dilate(edges, element=element)
+    comps = slice_login._connected_components(dilated)
+    h, w = img.shape[:2]
+    candidates = [b for b in comps if slice_login.MIN_AREA <= b[2] * b[3] <= w * h * 0.6]
+    boxes = slice_login.find_candidate_boxes(img)
+
+    def save():
+        out = os.path.join(tmp, 'save')
+        slice_login.save_slices(img, boxes, out)
+        return dir_checksum(out)
+
+    return [
+        ('edges_binary', lambda: slice_login._edges_binary(gray)),
+        ('dilate', lambda: slice_login._dilate(edges, element=element)),
+        ('connected_components', lambda: slice_login._connected_components(dilated)),
+        ('nms', lambda: slice_login._nms(candidates)),
+        ('find_candidate_boxes', lambda: slice_login.find_candidate_boxes(img)),
+        ('save_slices', save),
+        ('detect_largest_purple_rect', lambda: detect_largest_purple_rect(pil)),
+    ]
+
+
+def export_stage(path: str, tmp: str) -> Callable:
+    # interactive crop plan through the cache, from a cold cache each run
+    plan = slice_interactive_login.slice_plan(slice_interactive_login.load_config())
+
+    def run():
+        out = tempfile.mkdtemp(dir=tmp)
+        cache = build_cache.BuildCache(out)
+        export_crops(build_cache.LazySource(path), cache, plan, verbose=False)
+        return dir_checksum(out)
+    return run
+
+
+def run_suite(repeat: int, sizes, real: bool = True) -> Dict[str, Dict[str, dict]]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = []
+        if real and os.path.exists(REAL_PAGE):
+            cases.append(('login', Image.open(REAL_PAGE).convert('RGB')))
+        for w, h in sizes:
+            cases.append((f'synthetic_{w}x{h}', synthetic_design(w, h)))
+        for name, pil in cases:
+            results[name] = {}
+            stages = stages_for(pil, tmp)
+            if name == 'login':
+                stages.append(('export_crops', export_stage(REAL_PAGE, tmp)))
+            for stage, fn in stages:
+                results[name][stage] = measure(fn, repeat)
+                r = results[name][stage]
+                print(f'  {name:<22} {stage:<26} {r["time"] * 1000:9.2f} ms {r["peak_bytes"] / 1e6:8.1f} MB',
+                      file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold: float, min_delta: float, skipped=()) -> List[str]:
+    """Regressions against ``baseline``; cases in ``skipped`` (left out on purpose, e.g. --quick) are ignored."""
+    failures = []
+    for case, stages in baseline.get('results', {}).items():
+        if case in skipped:
+            continue
+        for stage, base in stages.items():
+            cur = results.get(case, {}).get(stage)
+            where = f'{case}/{stage}'
+            if cur is None:
+                # a removed or renamed stage must not pass the gate unnoticed
+                failures.append(f'{where}: in the baseline but not measured in this run')
+                continue
+            if cur['checksum'] != base['checksum']:
+                failures.append(f'{where}: output checksum {cur["checksum"]} != baseline {base["checksum"]}')
+            if cur['time'] > base['time'] * (1 + threshold) and cur['time'] - base['time'] > min_delta:
+                failures.append(f'{where}: {cur["time"] * 1000:.2f} ms vs baseline {base["time"] * 1000:.2f} ms')
+            if cur['peak_bytes'] > base['peak_bytes'] * (1 + threshold) and cur['peak_bytes'] - base['peak_bytes'] > 1 << 20:
+                failures.append(f'{where}: peak {cur["peak_bytes"] / 1e6:.1f} MB vs baseline {base["peak_bytes"] / 1e6:.1f} MB')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the slicing stages.')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per stage; the best is kept')
+    parser.add_argument('--quick', action='store_true', help='skip the largest synthetic size')
+    parser.add_argument('--out', help='write the result JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='baseline JSON to gate against')
+    parser.add_argument('--save-baseline', help='write the result as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression (default 0.25)')
+    parser.add_argument('--min-delta', type=float, default=0.005, help='ignore slowdowns below this many seconds')
+    args = parser.parse_args()
+
+    sizes = SYNTHETIC_SIZES[:-1] if args.quick else SYNTHETIC_SIZES
+    report = {
+        "env": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                "platform": platform.platform(), "cpus": os.cpu_count()},
+        "repeat": args.repeat,
+        "results": run_suite(args.repeat, sizes),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        build_cache.write_text_if_changed(args.out, text + '\n')
+    elif not args.save_baseline:
+        print(text)
+    if args.save_baseline:
+        build_cache.write_text_if_changed(args.save_baseline, text + '\n')
+        print(f'Baseline saved: {args.save_baseline}', file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        skipped = [f'synthetic_{w}x{h}' for w, h in SYNTHETIC_SIZES if (w, h) not in sizes]
+        failures = compare(report['results'], baseline, args.threshold, args.min_delta, skipped)
+        for msg in failures:
+            print(f'[regression] {msg}', file=sys.stderr)
+        if failures:
+            sys.exit(1)
+        print(f'No regressions against {args.baseline}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Content-hash build cache for generated slice assets.
+
+Each output is recorded in a manifest (``slice_manifest.json`` next to the
+slice JSON files) with the key of the inputs that produced it (source image
+hash + bbox/config) and the hash of the bytes written. A script asks
+``is_fresh`` before decoding/cropping; when the key matches and the file on
+disk is still the one we wrote, all work for that output is skipped. When
+something does need regenerating, ``write`` leaves the file untouched if
+the new bytes are identical, so the mini-program dev tools see no mtime
+change.
+
+NumPy, Pillow and the encoders are imported where they are used, so tools
+that only write text outputs (the WXML generators) start without them.
+"""
+import os
+import json
+import hashlib
+
+import slice_trace
+
+MANIFEST_NAME = 'slice_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def bytes_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def config_hash(obj) -> str:
+    text = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return bytes_hash(text.encode('utf-8'))
+
+
+def write_if_changed(path: str, data: bytes) -> bool:
+    """Write ``data`` to ``path`` unless the file already holds exactly it."""
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    with slice_trace.span('write', path=path, bytes=len(data)):
+        with open(path, 'wb') as f:
+            f.write(data)
+    return True
+
+
+def write_text_if_changed(path: str, text: str) -> bool:
+    return write_if_changed(path, text.encode('utf-8'))
+
+
+class BuildCache:
+    def __init__(self, out_dir: str, manifest_name: str = MANIFEST_NAME):
+        self.out_dir = out_dir
+        self.path = os.path.join(out_dir, manifest_name)
+        self.entries = {}
+        self.written = 0
+        self.skipped = 0
+        self._dirty = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.entries = data.get('entries', {})
+            except (OSError, ValueError) as e:
+                print(f'[warn] ignoring unreadable cache manifest {self.path}: {e}')
+
+    def _target(self, name: str) -> str:
+        return os.path.join(self.out_dir, name)
+
+    def file_for(self, name: str) -> str:
+        """File actually written for ``name`` (an encoder may change the extension)."""
+        return self.entries.get(name, {}).get('file', name)
+
+    def shared_file(self, name: str):
+        """File ``name`` was folded into by dedup_slices, or None."""
+        return self.entries.get(name, {}).get('shared')
+
+    def is_fresh(self, name: str, key: str) -> bool:
+        entry = self.entries.get(name)
+        if not entry or entry.get('key') != key:
+            return False
+        # a folded duplicate stays fresh while the shared file is the one it was folded into
+        path = self._target(self.shared_file(name) or self.file_for(name))
+        if not os.path.exists(path):
+            return False
+        st = os.stat(path)
+        if st.st_size == entry.get('size') and st.st_mtime_ns == entry.get('mtime_ns'):
+            fresh = True
+        else:
+            # touched or replaced since we wrote it: trust content, not mtime
+            fresh = file_hash(path) == entry.get('sha256')
+            if fresh:
+                self._record(name, key, entry['sha256'], entry.get('file'), entry.get('shared'))
+        if fresh:
+            self.skipped += 1
+        return fresh
+
+    def _record(self, name: str, key: str, digest: str, file: str = None, shared: str = None):
+        st = os.stat(self._target(shared or file or name))
+        entry = {"key": key, "sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        if file and file != name:
+            entry["file"] = file
+        if shared:
+            entry["shared"] = shared
+        self.entries[name] = entry
+        self._dirty = True
+
+    def write(self, name: str, key: str, data: bytes, file: str = None) -> bool:
+        changed = write_if_changed(self._target(file or name), data)
+        if changed:
+            self.written += 1
+        else:
+            self.skipped += 1
+        self._record(name, key, bytes_hash(data), file)
+        return changed
+
+    def share(self, name: str, shared: str):
+        """Fold ``name`` into the already written ``shared`` file and delete its own file."""
+        entry = self.entries[name]
+        own = self._target(self.file_for(name))
+        self._record(name, entry['key'], file_hash(self._target(shared)), entry.get('file'), shared)
+        if os.path.exists(own) and os.path.abspath(own) != os.path.abspath(self._target(shared)):
+            os.remove(own)
+
+    def save_image(self, name: str, key: str, image, spec: dict = None) -> str:
+        """Encode ``image`` with ``encoders.encode`` and write it; returns the file name used."""
+        import encoders
+        data, fmt = encoders.encode(image, spec)
+        file = encoders.output_name(name, fmt)
+        self.write(name, key, data, file)
+        return file
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = {"version": MANIFEST_VERSION, "entries": dict(sorted(self.entries.items()))}
+        text = json.dumps(data, ensure_ascii=False, indent=2) + '\n'
+        write_text_if_changed(self.path, text)
+        self._dirty = False
+
+    def summary(self) -> str:
+        return f'{self.written} written, {self.skipped} up to date'
+
+
+class LazySource:
+    """Design image that is hashed up front but only decoded on first use."""
+
+    def __init__(self, path: str, mode: str = 'RGB'):
+        self.path = path
+        from PIL import Image
+        self.mode = mode
+        self._header = Image.open(path)
+        self.size = self._header.size
+        self.key = file_hash(path)
+        self._image = None
+        self._array = None
+
+    @property
+    def decoded(self) -> bool:
+        return self._image is not None
+
+    @property
+    def image(self):
+        if self._image is None:
+            with slice_trace.span('decode', path=self.path, pixels=self.size[0] * self.size[1]):
+                self._image = self._header.convert(self.mode)
+        return self._image
+
+    @property
+    def array(self):
+        """The decoded image as a NumPy array; crops are views into it (``array[y1:y2, x1:x2]``)."""
+        if self._array is None:
+            import numpy as np
+            self._array = np.asarray(self.image)
+        return self._array
+
+    def output_key(self, **params) -> str:
+        return config_hash({"source": self.key, "mode": self.mode, **params})
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Vectorized colour-mask region detection.
+
+A colour predicate is any callable taking channel arrays and returning a
+boolean mask: ``pred(r, g, b)`` for RGB predicates, or one built with
+``hsv_range`` which is evaluated on the HSV channels instead. Channels are
+int16 so differences such as ``b - g`` do not wrap.
+"""
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+import slice_trace
+from slice_login import _label_components
+
+Range = Optional[Sequence[int]]
+
+
+def _within(ch: np.ndarray, bounds: Range) -> np.ndarray:
+    if bounds is None:
+        return np.ones(ch.shape, dtype=bool)
+    lo, hi = bounds
+    if lo <= hi:
+        return (ch >= lo) & (ch <= hi)
+    # wrapped interval, used for hue ranges crossing red
+    return (ch >= lo) | (ch <= hi)
+
+
+def rgb_range(r: Range = None, g: Range = None, b: Range = None) -> Callable:
+    """Predicate matching pixels whose channels fall in inclusive [lo, hi] bounds."""
+    def pred(rc, gc, bc):
+        return _within(rc, r) & _within(gc, g) & _within(bc, b)
+    return pred
+
+
+def hsv_range(h: Range = None, s: Range = None, v: Range = None) -> Callable:
+    """Like rgb_range on PIL's HSV scale (all channels 0-255); ``h`` may wrap (lo > hi)."""
+    def pred(hc, sc, vc):
+        return _within(hc, h) & _within(sc, s) & _within(vc, v)
+    pred.space = 'hsv'
+    return pred
+
+
+class ColorImage:
+    """Channel arrays of one image, converted once and shared by every predicate."""
+
+    def __init__(self, img):
+        if isinstance(img, Image.Image):
+            self._pil = img.convert('RGB')
+            rgb = np.asarray(self._pil)
+        else:
+            self._pil = None
+            rgb = np.asarray(img)
+        self.height, self.width = rgb.shape[:2]
+        self.rgb = rgb
+        self._channels = {}
+
+    def channels(self, space: str = 'rgb') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if space not in self._channels:
+            if space == 'rgb':
+                arr = self.rgb
+            elif space == 'hsv':
+                pil = self._pil if self._pil is not None else Image.fromarray(self.rgb)
+                arr = np.asarray(pil.convert('HSV'))
+            else:
+                raise ValueError(f'unknown colour space: {space!r}')
+            arr = arr.astype(np.int16)
+            self._channels[space] = (arr[:, :, 0], arr[:, :, 1], arr[:, :, 2])
+        return self._channels[space]
+
+    def mask(self, pred: Callable, region: Optional[Sequence[int]] = None) -> np.ndarray:
+        ch = self.channels(getattr(pred, 'space', 'rgb'))
+        if region is not None:
+            x, y, w, h = region
+            ch = tuple(c[y:y + h, x:x + w] for c in ch)
+        return np.asarray(pred(*ch), dtype=bool)
+
+
+def largest_region(mask: np.ndarray, min_pixels: int = 1) -> Optional[dict]:
+    """Largest 8-connected component of ``mask`` as {bbox, pixels, centroid}, or None."""
+    stats = _label_components(mask)
+    counts = stats["counts"]
+    if len(counts) == 0:
+        return None
+    best = int(np.argmax(counts))
+    if counts[best] < min_pixels:
+        return None
+    x, y, w, h = (int(v) for v in stats["boxes"][best])
+    cx, cy = (float(v) for v in stats["centroids"][best])
+    return {"bbox": [x, y, w, h], "pixels": int(counts[best]), "centroid": [cx, cy]}
+
+
+def find_color_anchors(img, anchors: Dict[str, Callable], region: Optional[Sequence[int]] = None,
+                       min_pixels: int = 1) -> Dict[str, Optional[dict]]:
+    """Locate several named colour anchors, converting the image only once.
+
+    ``region`` (x, y, w, h) restricts the search; returned bboxes are in full
+    image coordinates.
+    """
+    cimg = img if isinstance(img, ColorImage) else ColorImage(img)
+    ox, oy = (region[0], region[1]) if region is not None else (0, 0)
+    found = {}
+    for name, pred in anchors.items():
+        with slice_trace.span('color_anchor', anchor=name):
+            hit = largest_region(cimg.mask(pred, region), min_pixels)
+        if hit is not None:
+            hit["bbox"][0] += ox
+            hit["bbox"][1] += oy
+            hit["centroid"] = [hit["centroid"][0] + ox, hit["centroid"][1] + oy]
+        found[name] = hit
+    return found
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Fold identical and near-identical slices into one shared asset.
+
+Candidates are grouped by pixel size first (read from the PNG header, so
+files with a unique size are never decoded). Within a size, slices with the
+same pixel hash are duplicates outright; the rest are compared by a 64-bit
+difference hash (dHash), and pairs within ``max_distance`` bits are
+confirmed by their difference: the largest channel difference of each pixel
+(alpha-premultiplied RGBA, so hidden colour under transparent pixels does
+not count), averaged over the image, must be at most ``tolerance``. Each
+group keeps the first slice in page order; the others point at it.
+
+In the pipeline (a ``{"type": "dedup"}`` stage after the crop stages) folded
+slices get ``"src"`` in their metadata, which the WXML renderers load, and
+their own files are removed through the build cache. Run directly, the
+script only reports the groups it would fold:
+
+Usage: python3 scripts/dedup_slices.py [dir-or-file ...] [--max-distance 6] [--tolerance 3]
+"""
+import os
+import glob
+import hashlib
+import argparse
+from typing import Dict, List, Sequence
+
+import numpy as np
+from PIL import Image
+
+MAX_DISTANCE = 6
+TOLERANCE = 3.0  # absorbs sub-pixel anti-aliasing shifts of the same shape
+
+
+def _rgba(path: str) -> np.ndarray:
+    a = np.asarray(Image.open(path).convert('RGBA')).astype(np.float32)
+    a[:, :, :3] *= a[:, :, 3:] / 255.0
+    return a
+
+
+def pixel_hash(rgba: np.ndarray) -> str:
+    return hashlib.sha256(str(rgba.shape).encode() + rgba.tobytes()).hexdigest()
+
+
+def dhash(rgba: np.ndarray) -> int:
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 grey thumbnail."""
+    gray = rgba[:, :, :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    thumb = np.asarray(Image.fromarray(gray).resize((9, 8), Image.BILINEAR))
+    bits = (thumb[:, 1:] > thumb[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def find_groups(paths: Sequence[str], max_distance: int = MAX_DISTANCE,
+                tolerance: float = TOLERANCE) -> List[List[str]]:
+    """Groups (first path = kept) of two or more interchangeable images, in input order."""
+    by_size = {}
+    for p in dict.fromkeys(paths):
+        with Image.open(p) as im:
+            by_size.setdefault(im.size, []).append(p)
+    groups = []
+    for same in by_size.values():
+        if len(same) < 2:
+            continue
+        pixels = {p: _rgba(p) for p in same}
+        exact = {p: pixel_hash(a) for p, a in pixels.items()}
+        hashes = {p: dhash(a) for p, a in pixels.items()}
+        taken = set()
+        for i, rep in enumerate(same):
+            if rep in taken:
+                continue
+            group = [rep]
+            for p in same[i + 1:]:
+                if p in taken:
+                    continue
+                if exact[p] == exact[rep] or (
+                        bin(hashes[p] ^ hashes[rep]).count('1') <= max_distance
+                        and np.abs(pixels[p] - pixels[rep]).max(axis=2).mean() <= tolerance):
+                    group.append(p)
+            if len(group) > 1:
+                taken.update(group)
+                groups.append(group)
+    return groups
+
+
+def fold(metas: Sequence[List[dict]], cache, max_distance: int = MAX_DISTANCE,
+         tolerance: float = TOLERANCE) -> Dict[str, str]:
+    """Point duplicate slices of ``metas`` (export_crops metadata) at one shared file.
+
+    Sets ``"src"`` on every folded entry and moves the cache entry over to the
+    shared file. Returns {folded file: shared file}.
+    """
+    # cache entry name for each file written, to reach the entry from the metadata
+    entry_of = {cache.file_for(n): n for n in cache.entries}
+    current = {}
+    for meta in metas:
+        for m in meta:
+            if 'atlas' not in m and m['bbox'][2] > 0 and m['bbox'][3] > 0:
+                current[m['name']] = m.get('src', m['name'])
+    files = [f for f in dict.fromkeys(current.values()) if os.path.exists(os.path.join(cache.out_dir, f))]
+    groups = find_groups([os.path.join(cache.out_dir, f) for f in files], max_distance, tolerance)
+
+    target = {}
+    for group in groups:
+        rep = os.path.basename(group[0])
+        for path in group[1:]:
+            target[os.path.basename(path)] = rep
+    # slices folded in an earlier run keep their shared file unless it got folded too
+    folded = {}
+    for name, src in current.items():
+        shared = target.get(src, src)
+        if shared != name:
+            folded[name] = shared
+    for meta in metas:
+        for m in meta:
+            if m['name'] in folded:
+                m['src'] = folded[m['name']]
+    for name, shared in folded.items():
+        if name in entry_of:
+            cache.share(entry_of[name], shared)
+    return folded
+
+
+def _collect(args: Sequence[str]) -> List[str]:
+    paths = []
+    for a in args:
+        paths += sorted(glob.glob(os.path.join(a, '*.png'))) if os.path.isdir(a) else [a]
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report identical or near-identical slice images.')
+    parser.add_argument('paths', nargs='*', default=[os.path.join('miniprogram', 'assets', 'login')])
+    parser.add_argument('--max-distance', type=int, default=MAX_DISTANCE, help='dHash bits that may differ')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='mean per-pixel difference allowed (0-255)')
+    args = parser.parse_args()
+
+    groups = find_groups(_collect(args.paths), args.max_distance, args.tolerance)
+    saved = 0
+    for group in groups:
+        size = sum(os.path.getsize(p) for p in group[1:])
+        saved += size
+        print(f'{group[0]}  <-  ' + ', '.join(group[1:]) + f'  ({size / 1024:.1f} KB)')
+    print(f'{len(groups)} group(s), {sum(len(g) - 1 for g in groups)} duplicate(s), {saved / 1024:.1f} KB foldable')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Export the interactive login slices at several pixel densities in one pass.
+
+Bboxes in ``interactive_config.json`` are in pixels of the base density
+(``登录页.png`` is a @2x export). For every requested density the slices are
+cropped from a native source of that density when one is given, otherwise
+from the highest-density source resampled once (Lanczos) for the whole
+page. Densities above the highest source are skipped rather than upscaled.
+
+Each source is decoded once and only if some output is stale. Besides the
+PNGs (``name@{d}x.png``) a JSON manifest and a JS module are written; the
+module's ``pick(key, pixelRatio)`` returns the asset for the device.
+
+Usage: python3 scripts/density_export.py [--densities 1,2,3] [--source 3=path.png]
+"""
+import os
+import json
+import argparse
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+import build_cache
+import slice_interactive_login
+from slice_assets import clamp_bbox, export_crops
+
+BASE_DENSITY = 2
+OUT_DIR = slice_interactive_login.OUT_DIR
+OUT_JSON = os.path.join(OUT_DIR, 'density_slices.json')
+OUT_JS = os.path.join('miniprogram', 'pages', 'login', 'density-assets.js')
+
+
+class ScaledSource:
+    """A LazySource resampled by ``factor``; resampling happens on first use of ``image``."""
+
+    def __init__(self, src: build_cache.LazySource, factor: float):
+        self.src = src
+        self.path = src.path
+        self.mode = src.mode
+        self.size = (max(1, round(src.size[0] * factor)), max(1, round(src.size[1] * factor)))
+        self.key = src.output_key(resize=list(self.size), resample='lanczos')
+        self._image = None
+        self._array = None
+
+    @property
+    def decoded(self) -> bool:
+        return self._image is not None
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = self.src.image.resize(self.size, Image.LANCZOS)
+        return self._image
+
+    @property
+    def array(self):
+        if self._array is None:
+            self._array = np.asarray(self.image)
+        return self._array
+
+    def output_key(self, **params) -> str:
+        return build_cache.config_hash({"source": self.key, **params})
+
+
+def scale_bbox(bbox, factor: float) -> List[int]:
+    # round both edges so neighbouring slices stay edge-to-edge at every density
+    x, y, w, h = bbox
+    x1, y1 = round(x * factor), round(y * factor)
+    return [x1, y1, round((x + w) * factor) - x1, round((y + h) * factor) - y1]
+
+
+def asset_url(out_dir: str, name: str) -> str:
+    rel = os.path.relpath(os.path.join(out_dir, name), 'miniprogram').replace(os.sep, '/')
+    return '/' + rel
+
+
+def export_densities(sources: Dict[int, build_cache.LazySource], cache: build_cache.BuildCache, plan,
+                     densities, base: int = BASE_DENSITY, encode: dict = None, workers: int = None) -> dict:
+    """Crop ``plan`` ((name, bbox) at ``base`` density) for every density; returns the manifest dict."""
+    top = max(sources)
+    page_w, page_h = (round(v * base / top) for v in sources[top].size)
+    done = []
+    slices = {}
+    for d in sorted(set(densities)):
+        if d > top:
+            print(f'[warn] no @{d}x source (highest is @{top}x); skipped')
+            continue
+        src = sources[d] if d in sources else ScaledSource(sources[top], d / top)
+        scaled = []
+        for name, bbox in plan:
+            stem = os.path.splitext(name)[0]
+            scaled.append((f'{stem}@{d}x.png', scale_bbox(bbox, d / base)))
+            if stem not in slices:
+                x1, y1, x2, y2 = clamp_bbox(page_w, page_h, *bbox)
+                slices[stem] = {"bbox": [x1, y1, x2 - x1, y2 - y1], "files": {}}
+        meta = export_crops(src, cache, scaled, encode, workers, verbose=False)
+        for (name, _), m in zip(plan, meta):
+            stem = os.path.splitext(name)[0]
+            slices[stem]["files"][str(d)] = asset_url(cache.out_dir, m.get('src', m['name']))
+        done.append(d)
+    return {"base_density": base, "densities": done, "slices": slices}
+
+
+def density_js(manifest: dict) -> str:
+    body = json.dumps(manifest, ensure_ascii=False, indent=2)
+    return f'''// generated by scripts/density_export.py
+const manifest = {body}
+
+// smallest density >= pixelRatio, else the largest available
+function pick(key, pixelRatio) {{
+  const ds = manifest.densities
+  let d = ds[ds.length - 1]
+  for (const x of ds) {{
+    if (x >= pixelRatio) {{ d = x; break }}
+  }}
+  return manifest.slices[key].files[String(d)]
+}}
+
+module.exports = {{ ...manifest, pick }}
+'''
+
+
+def parse_sources(values) -> Dict[int, str]:
+    sources = {BASE_DENSITY: slice_interactive_login.IN_PATH}
+    for v in values or []:
+        d, _, path = v.partition('=')
+        sources[int(d.strip('@x'))] = path
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the interactive login slices at several densities.')
+    parser.add_argument('--densities', default='1,2,3', help='comma-separated densities (default: 1,2,3)')
+    parser.add_argument('--source', action='append', metavar='D=PATH',
+                        help=f'page export at density D (default: {BASE_DENSITY}={slice_interactive_login.IN_PATH})')
+    parser.add_argument('--config', default=slice_interactive_login.CFG_PATH)
+    parser.add_argument('--out-dir', default=OUT_DIR)
+    parser.add_argument('--js', default=OUT_JS, help='JS manifest module for the mini-program')
+    args = parser.parse_args()
+
+    paths = parse_sources(args.source)
+    for path in paths.values():
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'Input not found: {path}')
+    os.makedirs(args.out_dir, exist_ok=True)
+    sources = {d: build_cache.LazySource(p) for d, p in paths.items()}
+    cache = build_cache.BuildCache(args.out_dir)
+    plan = slice_interactive_login.slice_plan(slice_interactive_login.load_config(args.config))
+    densities = [int(d) for d in args.densities.split(',') if d.strip()]
+
+    manifest = export_densities(sources, cache, plan, densities)
+    cache.save()
+    out_json = os.path.join(args.out_dir, os.path.basename(OUT_JSON))
+    build_cache.write_text_if_changed(out_json, json.dumps(manifest, ensure_ascii=False, indent=2))
+    build_cache.write_text_if_changed(args.js, density_js(manifest))
+    decodes = sum(1 for s in sources.values() if s.decoded)
+    print(f'Densities {manifest["densities"]} written: {out_json}, {args.js}; '
+          f'{decodes} decode(s); assets: {cache.summary()}')
+
+
+if __name__ == '__main__':
+    main()
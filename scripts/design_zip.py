@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Read the designer's layer exports straight from ``UIDESIGN/*.zip``.
+
+The archive no longer has to be unpacked next to it: ``DesignArchive`` reads
+the zip's central directory, and an index of layers (member name, density,
+pixel size) is built once from the PNG headers and cached in a sidecar
+``.<archive>.index.json`` keyed by the archive's size and mtime. Layer
+pixels are only decompressed when a layer is actually used, so aligning four
+config layers reads four members, not all 42.
+
+Member names written without the zip UTF-8 flag are stored in the creator's
+locale (GBK from Chinese Windows tools); zipfile decodes those as cp437, so
+they are re-decoded before use.
+
+    layers = DesignArchive('UIDESIGN/登录页.zip').layers('@2x')   # lazy Mapping
+    layers['圆角矩形 7'].size
+
+Usage: python3 scripts/design_zip.py [archive.zip] [--density @2x]
+"""
+import io
+import os
+import json
+import struct
+import zipfile
+import argparse
+from collections.abc import Mapping
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+import build_cache
+import slice_trace
+
+ARCHIVE = os.path.join('UIDESIGN', '登录页.zip')
+INDEX_VERSION = 1
+UTF8_FLAG = 0x800
+LEGACY_ENCODINGS = ('utf-8', 'gbk')
+
+
+def member_name(info: zipfile.ZipInfo) -> str:
+    """``info.filename`` decoded the way the archive's creator wrote it."""
+    if info.flag_bits & UTF8_FLAG:
+        return info.filename
+    raw = info.filename.encode('cp437')
+    for encoding in LEGACY_ENCODINGS:
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return info.filename
+
+
+def split_density(filename: str) -> Optional[Tuple[str, str]]:
+    """('圆角矩形 7', '@2x') for '圆角矩形 7@2x.png'; exports without a suffix are @1x."""
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    if ext.lower() != '.png' or not stem:
+        return None
+    base, at, scale = stem.rpartition('@')
+    if at and scale[:-1].isdigit() and scale.endswith('x'):
+        return base, '@' + scale
+    return stem, '@1x'
+
+
+def _png_size(head: bytes) -> Optional[Tuple[int, int]]:
+    # signature (8) + IHDR length/type (8) + width, height
+    if len(head) < 24 or head[:8] != b'\x89PNG\r\n\x1a\n' or head[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', head[16:24])
+
+
+class DesignArchive:
+    """Layer index and on-demand layer decode for one design zip."""
+
+    def __init__(self, path: str = ARCHIVE, index_path: str = None):
+        self.path = path
+        self.index_path = index_path or os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.index.json')
+        self._zip = None
+        self._index = None
+
+    @property
+    def zip(self) -> zipfile.ZipFile:
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.path)
+        return self._zip
+
+    def _version(self) -> dict:
+        st = os.stat(self.path)
+        return {"version": INDEX_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    @property
+    def index(self) -> Dict[str, Dict[str, dict]]:
+        """{layer: {density: {"member", "size"}}}, from the sidecar when it is current."""
+        if self._index is None:
+            version = self._version()
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('archive') == version:
+                    self._index = cached['layers']
+            except (OSError, ValueError, KeyError):
+                pass
+            if self._index is None:
+                self._index = self.build_index()
+                try:
+                    build_cache.write_text_if_changed(self.index_path, json.dumps(
+                        {"archive": version, "layers": self._index}, ensure_ascii=False, indent=2) + '\n')
+                except OSError as e:
+                    print(f'[warn] cannot cache zip index at {self.index_path}: {e}')
+        return self._index
+
+    def build_index(self) -> Dict[str, Dict[str, dict]]:
+        index = {}
+        with slice_trace.span('zip_index', path=self.path) as sp:
+            for info in self.zip.infolist():
+                if info.is_dir():
+                    continue
+                parsed = split_density(member_name(info))
+                if parsed is None:
+                    continue
+                # only the PNG header is decompressed
+                with self.zip.open(info) as f:
+                    size = _png_size(f.read(24))
+                if size is None:
+                    continue
+                layer, density = parsed
+                index.setdefault(layer, {})[density] = {"member": info.filename, "size": list(size)}
+            sp.set(layers=len(index))
+        return index
+
+    def densities(self):
+        return sorted({d for entry in self.index.values() for d in entry})
+
+    def read(self, layer: str, density: str) -> bytes:
+        return self.zip.read(self.index[layer][density]['member'])
+
+    def open(self, layer: str, density: str) -> Image.Image:
+        with slice_trace.span('zip_layer', layer=layer, density=density):
+            return Image.open(io.BytesIO(self.read(layer, density)))
+
+    def layers(self, density: str) -> 'LazyLayers':
+        return LazyLayers(self, density)
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+
+class LazyLayers(Mapping):
+    """{layer name: PIL image} at one density; a member is decompressed on first access."""
+
+    def __init__(self, archive: DesignArchive, density: str):
+        self.archive = archive
+        self.density = density
+        self._names = sorted(k for k, v in archive.index.items() if density in v)
+        self._images = {}
+
+    def __getitem__(self, name: str) -> Image.Image:
+        if name not in self._images:
+            if name not in self._names:
+                raise KeyError(name)
+            self._images[name] = self.archive.open(name, self.density)
+        return self._images[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self.archive.index and self.density in self.archive.index[name]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def size(self, name: str) -> Tuple[int, int]:
+        """Pixel size from the index, without decompressing the layer."""
+        return tuple(self.archive.index[name][self.density]['size'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List the layers of a design zip without unpacking it.')
+    parser.add_argument('archive', nargs='?', default=ARCHIVE)
+    parser.add_argument('--density', help='only this density, e.g. @2x')
+    args = parser.parse_args()
+
+    archive = DesignArchive(args.archive)
+    for layer, entry in sorted(archive.index.items()):
+        for density, m in sorted(entry.items()):
+            if args.density in (None, density):
+                print(f'{layer:<24} {density:<4} {m["size"][0]:>5}x{m["size"][1]:<5} {m["member"]}')
+    print(f'{len(archive.index)} layer(s), densities: {", ".join(archive.densities())}')
+
+
+if __name__ == '__main__':
+    main()
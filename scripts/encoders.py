@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Output encoders for slice assets, with a per-asset byte budget.
+
+An encode spec is a small dict:
+
+    {"format": "png" | "webp" | "jpeg" | "auto", "budget": bytes or None,
+     "quality": 85, "min_quality": 50, "lossy": "jpeg" | "webp", "optimize": true}
+
+"png" is lossless: images with at most 256 colours are stored as exact
+palette PNGs, and every candidate is saved with maximum zlib effort; the
+smallest wins. "webp"/"jpeg" are lossy and step the quality down until the
+budget is met. "optimize": false trades size for speed (zlib level 1, no
+palette search, fastest WebP method) for quick preview builds. "auto" keeps
+the lossless PNG when it fits the budget and otherwise falls back to the
+``lossy`` format for photographic content. That defaults to JPEG because the
+mini-program <image> only decodes WebP for network resources. JPEG has no
+alpha, so a slice with real transparency goes to WebP instead, or stays PNG
+when Pillow has no WebP. Slices are encoded in a thread pool; Pillow
+releases the GIL while compressing. The reported "before" size is what a
+plain ``Image.save(PNG)`` writes, i.e. what the scripts shipped before.
+"""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, features
+
+import slice_trace
+
+DEFAULT_SPEC = {"format": "png", "budget": None, "quality": 85, "min_quality": 50, "lossy": "jpeg", "optimize": True}
+EXTENSIONS = {"png": ".png", "webp": ".webp", "jpeg": ".jpg"}
+PHOTO_COLOURS = 4096
+
+
+def resolve_spec(spec: Optional[dict]) -> dict:
+    out = dict(DEFAULT_SPEC)
+    if spec:
+        out.update(spec)
+    if out["format"] not in ("png", "webp", "jpeg", "auto"):
+        raise ValueError(f'unknown encoder format: {out["format"]!r}')
+    if out["lossy"] not in ("webp", "jpeg"):
+        raise ValueError(f'unknown lossy format: {out["lossy"]!r}')
+    return out
+
+
+def _save(image: Image.Image, fmt: str, **params) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format=fmt, **params)
+    return buf.getvalue()
+
+
+def _exact_palette(image: Image.Image) -> Optional[Image.Image]:
+    # lossless palette image when the picture has at most 256 distinct colours
+    mode = 'RGBA' if image.mode == 'RGBA' else 'RGB'
+    arr = np.asarray(image.convert(mode))
+    flat = arr.reshape(-1, arr.shape[2])
+    packed = np.zeros(len(flat), dtype=np.uint32)
+    for c in range(flat.shape[1]):
+        packed = (packed << 8) | flat[:, c]
+    colours, index = np.unique(packed, return_inverse=True)
+    if len(colours) > 256:
+        return None
+    channels = [(colours >> (8 * (flat.shape[1] - 1 - c))) & 0xFF for c in range(flat.shape[1])]
+    palette = np.stack(channels, axis=1).astype(np.uint8)
+    pal = Image.fromarray(index.astype(np.uint8).reshape(arr.shape[:2]), 'P')
+    pal.putpalette(palette.tobytes(), rawmode=mode)
+    return pal
+
+
+def encode_png(image: Image.Image, optimize: bool = True) -> bytes:
+    if not optimize:
+        return _save(image, 'PNG', compress_level=1)
+    candidates = [_save(image, 'PNG', optimize=True)]
+    pal = _exact_palette(image)
+    if pal is not None:
+        candidates.append(_save(pal, 'PNG', optimize=True))
+    return min(candidates, key=len)
+
+
+def is_photographic(image: Image.Image) -> bool:
+    return image.getcolors(PHOTO_COLOURS) is None
+
+
+def is_transparent(image: Image.Image) -> bool:
+    """True when some pixel is not fully opaque (JPEG would lose it)."""
+    if image.mode in ('RGBA', 'LA', 'PA'):
+        return image.getchannel('A').getextrema()[0] < 255
+    if 'transparency' in image.info:
+        return is_transparent(image.convert('RGBA'))
+    return False
+
+
+def _lossy_format(image: Image.Image, fmt: str):
+    """``fmt``, or the nearest lossy format Pillow can write that keeps ``image``'s alpha; None for PNG."""
+    if fmt == 'webp' and not features.check('webp'):
+        fmt = 'jpeg'
+    if fmt == 'jpeg' and is_transparent(image):
+        fmt = 'webp' if features.check('webp') else None
+    return fmt
+
+
+def _lossy(image: Image.Image, fmt: str, spec: dict) -> bytes:
+    quality = int(spec["quality"])
+    budget = spec["budget"]
+    if fmt == 'jpeg':
+        image = image.convert('RGB')
+    opt = bool(spec["optimize"])
+    params = {"optimize": opt} if fmt == 'jpeg' else {"method": 6 if opt else 0}
+    data = _save(image, fmt.upper(), quality=quality, **params)
+    while budget and len(data) > budget and quality > spec["min_quality"]:
+        quality = max(int(spec["min_quality"]), quality - 5)
+        data = _save(image, fmt.upper(), quality=quality, **params)
+    return data
+
+
+def encode(image: Image.Image, spec: Optional[dict] = None) -> Tuple[bytes, str]:
+    """Encode ``image`` according to ``spec``; returns (bytes, format)."""
+    spec = resolve_spec(spec)
+    fmt = spec["format"]
+    if fmt in ('webp', 'jpeg'):
+        lossy_fmt = _lossy_format(image, fmt)
+        if lossy_fmt != fmt:
+            print(f'[warn] cannot write {fmt} here (no WebP in Pillow, or transparency); using {lossy_fmt or "png"}')
+        if lossy_fmt:
+            return _lossy(image, lossy_fmt, spec), lossy_fmt
+        return encode_png(image, spec["optimize"]), 'png'
+    data = encode_png(image, spec["optimize"])
+    if fmt == 'auto' and spec["budget"] and len(data) > spec["budget"] and is_photographic(image):
+        lossy_fmt = _lossy_format(image, spec["lossy"])
+        if lossy_fmt:
+            lossy = _lossy(image, lossy_fmt, spec)
+            if len(lossy) < len(data):
+                return lossy, lossy_fmt
+    return data, 'png'
+
+
+def output_name(name: str, fmt: str) -> str:
+    return os.path.splitext(name)[0] + EXTENSIONS[fmt]
+
+
+def _pixels(image) -> int:
+    return image.shape[0] * image.shape[1] if isinstance(image, np.ndarray) else image.width * image.height
+
+
+def _encode_one(item) -> dict:
+    name, image, spec = item
+    if isinstance(image, np.ndarray):
+        # crop view of a decoded design; PIL takes its own copy of just this region
+        image = Image.fromarray(image)
+    data, fmt = encode(image, spec)
+    budget = resolve_spec(spec)["budget"]
+    return {
+        "name": output_name(name, fmt), "source_name": name, "data": data, "format": fmt,
+        # a default Image.save(PNG), as the scripts wrote before this encoder
+        "before": len(_save(image, 'PNG')), "after": len(data), "over_budget": bool(budget and len(data) > budget),
+    }
+
+
+def encode_many(items: Iterable[Tuple[str, Image.Image, Optional[dict]]], workers: int = None) -> List[dict]:
+    """Encode (name, image, spec) items in parallel, preserving order.
+
+    Images may be PIL images or NumPy crop views (``arr[y1:y2, x1:x2]``);
+    views are only copied when their worker picks them up.
+    """
+    items = list(items)
+    with slice_trace.span('encode', images=len(items), pixels=sum(_pixels(im) for _, im, _ in items)) as sp:
+        if len(items) <= 1:
+            results = [_encode_one(it) for it in items]
+        else:
+            with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+                results = list(pool.map(_encode_one, items))
+        sp.set(bytes_before=total_before(results), bytes=sum(r["after"] for r in results))
+    return results
+
+
+def total_before(results: List[dict]) -> int:
+    return sum(r["before"] for r in results)
+
+
+def report(results: List[dict]):
+    if not results:
+        return
+    for r in results:
+        flag = '  OVER BUDGET' if r["over_budget"] else ''
+        saved = 100.0 * (1 - r["after"] / r["before"]) if r["before"] else 0.0
+        print(f'  {r["name"]:<28} {r["before"]:>9} -> {r["after"]:>9} bytes ({saved:5.1f}% smaller){flag}')
+    print(f'  {"total":<28} {total_before(results):>9} -> {sum(r["after"] for r in results):>9} bytes')
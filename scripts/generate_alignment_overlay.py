@@ -23,14 +23,9 @@ def rect(draw, bbox, color, width=3):
     x, y, w, h = bbox
     draw.rectangle([x, y, x+w, y+h], outline=color, width=width)
 
-def main():
-    if not os.path.exists(IN_IMG):
-        raise FileNotFoundError(f'Input not found: {IN_IMG}')
-    img = Image.open(IN_IMG).convert('RGB')
+def draw_overlay(img, cfg):
+    img = img.copy()
     draw = ImageDraw.Draw(img)
-
-    with open(CFG_PATH, 'r', encoding='utf-8') as f:
-        cfg = json.load(f)
     b = cfg.get('bboxes', {})
     i = cfg.get('inputs', {})
 
@@ -48,10 +43,19 @@ def main():
         rect(draw, i['username'], COLORS['username_input'], width=2)
     if 'password' in i:
         rect(draw, i['password'], COLORS['password_input'], width=2)
+    return img
+
+def main():
+    if not os.path.exists(IN_IMG):
+        raise FileNotFoundError(f'Input not found: {IN_IMG}')
+    img = Image.open(IN_IMG).convert('RGB')
+
+    with open(CFG_PATH, 'r', encoding='utf-8') as f:
+        cfg = json.load(f)
 
     os.makedirs(os.path.dirname(OUT_IMG), exist_ok=True)
-    img.save(OUT_IMG)
+    draw_overlay(img, cfg).save(OUT_IMG)
     print(f'Audit overlay written: {OUT_IMG}')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""goup-assets: one entry point for the slicing tools, with fast startup.
+
+Each subcommand runs an existing script's ``main`` with the remaining
+arguments, so options and output are unchanged. Nothing heavy is imported
+at module load: NumPy, Pillow and the script module are imported only
+inside the subcommand that needs them, and ``wxml`` (JSON in, WXML out)
+runs without either. ``--import-time`` prints how long each of those
+imports took.
+
+Usage: python3 scripts/goup_assets.py [--import-time] <command> [args ...]
+
+    slice    slice_login.py: detect and export slices (<input_png> <output_dir> ...)
+    reslice  reslice_004.py / reslice_012.py (default: both)
+    align    template_align.py: bboxes from the design layers
+    overlay  generate_alignment_overlay.py: audit.png
+    wxml     generate_login_wxml.py: login.wxml from slices.json
+"""
+import time
+_T0 = time.perf_counter()
+
+import sys
+import argparse
+import importlib
+
+# command -> (modules imported in order, the script's module, help)
+COMMANDS = {
+    "slice": (("numpy", "PIL.Image"), "slice_login", "detect and export slices from a page"),
+    "reslice": (("numpy", "PIL.Image"), None, "re-crop slice_004 / slice_012"),
+    "align": (("numpy", "PIL.Image"), "template_align", "align config bboxes to the design layers"),
+    "overlay": (("PIL.Image",), "generate_alignment_overlay", "draw the alignment audit overlay"),
+    "wxml": ((), "generate_login_wxml", "regenerate login.wxml from slices.json"),
+}
+RESLICE = {"004": "reslice_004", "012": "reslice_012"}
+
+_timings = []
+
+
+def _import(name: str):
+    before = len(sys.modules)
+    t0 = time.perf_counter()
+    module = importlib.import_module(name)
+    _timings.append((name, time.perf_counter() - t0, len(sys.modules) - before))
+    return module
+
+
+def run(command: str, args) -> None:
+    deps, module, _ = COMMANDS[command]
+    for dep in deps:
+        _import(dep)
+    prog = f'goup-assets {command}'
+    if command == 'reslice':
+        parser = argparse.ArgumentParser(prog=prog, description=COMMANDS[command][2])
+        parser.add_argument('which', nargs='*', choices=sorted(RESLICE), default=sorted(RESLICE))
+        for key in parser.parse_args(args).which:
+            sys.argv = [prog]
+            _import(RESLICE[key]).main()
+        return
+    main = _import(module).main
+    # the scripts parse sys.argv themselves
+    sys.argv = [prog] + list(args)
+    main()
+
+
+def report_imports(startup: float):
+    print(f'import time: goup-assets itself {startup * 1000:.1f} ms', file=sys.stderr)
+    for name, seconds, modules in _timings:
+        print(f'  {name:<28} {seconds * 1000:8.1f} ms  ({modules} module(s))', file=sys.stderr)
+    total = startup + sum(s for _, s, _ in _timings)
+    print(f'  {"total":<28} {total * 1000:8.1f} ms', file=sys.stderr)
+
+
+def main():
+    startup = time.perf_counter() - _T0
+    parser = argparse.ArgumentParser(prog='goup-assets', description='Slicing tools for the login page assets.',
+                                     epilog='Arguments after the command go to that script.')
+    parser.add_argument('--import-time', action='store_true', help='report import time per module on stderr')
+    parser.add_argument('command', choices=list(COMMANDS),
+                        help='; '.join(f'{k}: {v[2]}' for k, v in COMMANDS.items()))
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    try:
+        run(args.command, args.args)
+    finally:
+        if args.import_time:
+            report_imports(startup)
+
+
+if __name__ == '__main__':
+    main()
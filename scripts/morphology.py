@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Binary/greyscale morphology built on van Herk/Gil-Werman running filters.
+
+A structuring element is any 2-D boolean mask whose origin is its centre
+pixel (``(kh // 2, kw // 2)``). It is covered by axis-aligned rectangles
+(each row run grown over the neighbouring rows that contain it) and every
+rectangle is applied as a horizontal then a vertical running max/min. Each
+running filter costs three comparisons per pixel whatever its length, so a
+rectangle costs the same for 3x3 and 51x51; an ellipse costs one pass per
+distinct row width instead of one per element pixel.
+"""
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+Size = Union[int, Sequence[int]]
+
+
+def _size_hw(size: Size) -> Tuple[int, int]:
+    if isinstance(size, (int, np.integer)):
+        kh = kw = int(size)
+    else:
+        kh, kw = (int(v) for v in size)
+    if kh < 1 or kw < 1:
+        raise ValueError(f'structuring element size must be positive, got {size!r}')
+    return kh, kw
+
+
+def structuring_element(size: Size = 3, shape: str = 'rect') -> np.ndarray:
+    """Boolean mask of ``size`` (int or (h, w)); ``shape`` is 'rect' or 'ellipse'."""
+    kh, kw = _size_hw(size)
+    if shape == 'rect':
+        return np.ones((kh, kw), dtype=bool)
+    if shape == 'ellipse':
+        ry, rx = kh / 2.0, kw / 2.0
+        yy = np.arange(kh) - (kh - 1) / 2.0
+        xx = np.arange(kw) - (kw - 1) / 2.0
+        return (yy[:, None] / ry) ** 2 + (xx[None, :] / rx) ** 2 <= 1.0
+    raise ValueError(f'unknown structuring element shape: {shape!r}')
+
+
+def _rectangles(element: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Cover of ``element`` by rectangles (dy1, dy2, dx1, dx2), origin-relative.
+
+    Every row run is grown vertically for as long as the rows above and below
+    contain it, so convex shapes need one rectangle per distinct row width.
+    Rectangles may overlap, which max/min filters do not mind.
+    """
+    mask = np.asarray(element, dtype=bool)
+    if mask.ndim != 2 or not mask.any():
+        raise ValueError('structuring element must be a non-empty 2-D mask')
+    kh, kw = mask.shape
+    oy, ox = kh // 2, kw // 2
+    framed = np.zeros((kh, kw + 2), dtype=np.int8)
+    framed[:, 1:-1] = mask
+    d = np.diff(framed, axis=1)
+    rects = set()
+    for y in range(kh):
+        for x1, x2 in zip(np.nonzero(d[y] == 1)[0].tolist(), (np.nonzero(d[y] == -1)[0] - 1).tolist()):
+            y1 = y
+            while y1 > 0 and mask[y1 - 1, x1:x2 + 1].all():
+                y1 -= 1
+            y2 = y
+            while y2 < kh - 1 and mask[y2 + 1, x1:x2 + 1].all():
+                y2 += 1
+            rects.add((y1 - oy, y2 - oy, x1 - ox, x2 - ox))
+    return sorted(rects)
+
+
+def _running(a: np.ndarray, axis: int, lo: int, k: int, op, fill) -> np.ndarray:
+    """out[i] = op(a[i + lo], ..., a[i + lo + k - 1]) along ``axis``; ``fill`` outside."""
+    a = np.moveaxis(a, axis, -1)
+    n = a.shape[-1]
+    left = max(0, -lo)
+    right = max(0, lo + k - 1)
+    length = n + left + right
+    nblocks = -(-length // k)
+    padded = np.full(a.shape[:-1] + (nblocks * k,), fill, dtype=a.dtype)
+    padded[..., left:left + n] = a
+    if k == 1:
+        r = padded
+    else:
+        blocks = padded.reshape(a.shape[:-1] + (nblocks, k))
+        g = op.accumulate(blocks, axis=-1).reshape(padded.shape)
+        h = op.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+        span = padded.shape[-1] - k + 1
+        r = op(h[..., :span], g[..., k - 1:k - 1 + span])
+    start = lo + left
+    out = r[..., start:start + n]
+    return np.ascontiguousarray(np.moveaxis(out, -1, axis))
+
+
+def _apply(image: np.ndarray, rects, op, fill, reflect: bool) -> np.ndarray:
+    out = None
+    row_cache = {}
+    for dy1, dy2, dx1, dx2 in rects:
+        if reflect:
+            dy1, dy2, dx1, dx2 = -dy2, -dy1, -dx2, -dx1
+        key = (dx1, dx2)
+        if key not in row_cache:
+            row_cache[key] = _running(image, 1, dx1, dx2 - dx1 + 1, op, fill)
+        part = _running(row_cache[key], 0, dy1, dy2 - dy1 + 1, op, fill)
+        out = part if out is None else op(out, part, out=out)
+    return out
+
+
+def _is_full_rect(element: np.ndarray) -> bool:
+    return bool(np.all(element))
+
+
+def _element(element, iterations: int) -> Tuple[List[Tuple[int, int, int, int]], int]:
+    """Rectangles of ``element`` and the number of passes still to apply."""
+    se = structuring_element(3) if element is None else np.asarray(element, dtype=bool)
+    rects = _rectangles(se)
+    if iterations > 1 and _is_full_rect(se):
+        # n passes of a rectangle are one pass of it with every origin-relative offset scaled
+        # by n; scaling the offsets (not the size) keeps the anchor right for even sides
+        (dy1, dy2, dx1, dx2), = rects
+        rects = [(dy1 * iterations, dy2 * iterations, dx1 * iterations, dx2 * iterations)]
+        iterations = 1
+    return rects, iterations
+
+
+def dilate(image: np.ndarray, element: np.ndarray = None, iterations: int = 1) -> np.ndarray:
+    """Max filter of ``image`` over ``element`` (3x3 square by default); zero outside."""
+    rects, iterations = _element(element, iterations)
+    out = image
+    for _ in range(iterations):
+        out = _apply(out, rects, np.maximum, np.zeros((), dtype=image.dtype), reflect=True)
+    return out
+
+
+def erode(image: np.ndarray, element: np.ndarray = None, iterations: int = 1) -> np.ndarray:
+    """Min filter of ``image`` over ``element``; the border does not erode."""
+    rects, iterations = _element(element, iterations)
+    if image.dtype == bool:
+        top = True
+    elif np.issubdtype(image.dtype, np.integer):
+        top = np.iinfo(image.dtype).max
+    else:
+        top = np.inf
+    out = image
+    for _ in range(iterations):
+        out = _apply(out, rects, np.minimum, np.array(top, dtype=image.dtype), reflect=False)
+    return out
+
+
+def opening(image: np.ndarray, element: np.ndarray = None) -> np.ndarray:
+    """Erode then dilate: removes specks smaller than ``element``."""
+    return dilate(erode(image, element), element)
+
+
+def closing(image: np.ndarray, element: np.ndarray = None) -> np.ndarray:
+    """Dilate then erode: bridges gaps narrower than ``element``."""
+    return erode(dilate(image, element), element)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Non-maximum suppression for (x, y, w, h) boxes ranked by area.
+
+Overlapping pairs are found once through a sorted x-interval index (a box
+only needs checking against boxes whose x-interval starts before its own
+ends), then IoU / containment is computed for all those pairs in NumPy. The
+greedy pass walks the boxes largest-first and drops any box whose
+suppressing partner was kept, which is exactly the former
+compare-against-every-selected-box loop.
+
+Modes:
+  greedy       drop a box whose IoU with a kept, larger box exceeds the threshold
+  containment  greedy, and also drop boxes lying (mostly) inside a kept, larger box
+  soft         soft-NMS: overlaps decay a box's score (Gaussian) instead of
+               removing it; boxes whose score falls below ``score_threshold`` go
+"""
+import math
+import heapq
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+MODES = ('greedy', 'containment', 'soft')
+
+
+def _area_order(b: np.ndarray) -> np.ndarray:
+    # largest first; stable, so equal areas keep their input order
+    return np.argsort(-(b[:, 2] * b[:, 3]), kind='stable')
+
+
+def overlap_pairs(b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """All pairs (i, j) of boxes with a positive intersection, and that intersection area."""
+    n = len(b)
+    if n < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    x1, y1 = b[:, 0], b[:, 1]
+    x2, y2 = x1 + b[:, 2], y1 + b[:, 3]
+    by_x = np.argsort(x1, kind='stable')
+    xs = x1[by_x]
+    # boxes after position p in x order whose interval starts before box p ends
+    hi = np.searchsorted(xs, x2[by_x], side='left')
+    span = np.maximum(hi - np.arange(n) - 1, 0)
+    first = np.repeat(np.arange(n), span)
+    offs = np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span)
+    i = by_x[first]
+    j = by_x[first + 1 + offs]
+    iw = np.minimum(x2[i], x2[j]) - np.maximum(x1[i], x1[j])
+    ih = np.minimum(y2[i], y2[j]) - np.maximum(y1[i], y1[j])
+    hit = (iw > 0) & (ih > 0)
+    return i[hit], j[hit], (iw * ih)[hit]
+
+
+def _iou(area: np.ndarray, i: np.ndarray, j: np.ndarray, inter: np.ndarray) -> np.ndarray:
+    union = area[i] + area[j] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1).astype(np.float64), 0.0)
+
+
+def _greedy(order: np.ndarray, sup_i: np.ndarray, sup_j: np.ndarray) -> List[int]:
+    # sup_i ranks before sup_j and would suppress it if kept
+    by_victim = {}
+    for a, v in zip(sup_i.tolist(), sup_j.tolist()):
+        by_victim.setdefault(v, []).append(a)
+    kept = np.zeros(len(order), dtype=bool)
+    out = []
+    for idx in order.tolist():
+        if not any(kept[a] for a in by_victim.get(idx, ())):
+            kept[idx] = True
+            out.append(idx)
+    return out
+
+
+def _oriented(order, i, j, *vals):
+    # orient every pair so the first box ranks earlier (is larger / listed first)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    swap = rank[i] > rank[j]
+    a = np.where(swap, j, i)
+    v = np.where(swap, i, j)
+    return (a, v) + vals
+
+
+def suppress(boxes: Sequence[Box], iou_threshold: float = 0.9, mode: str = 'greedy',
+             containment: float = 0.9, sigma: float = 0.5, score_threshold: float = 0.3) -> List[Box]:
+    """Boxes surviving NMS, in selection order (largest first for greedy modes)."""
+    if mode not in MODES:
+        raise ValueError(f'unknown NMS mode: {mode!r}')
+    boxes = [tuple(int(v) for v in bx) for bx in boxes]
+    if not boxes:
+        return []
+    b = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    area = b[:, 2] * b[:, 3]
+    order = _area_order(b)
+    i, j, inter = overlap_pairs(b)
+    iou = _iou(area, i, j, inter)
+
+    if mode == 'soft':
+        return [boxes[k] for k in _soft(order, i, j, iou, sigma, score_threshold)]
+
+    a, v, iou, inter = _oriented(order, i, j, iou, inter)
+    hit = iou > iou_threshold
+    if mode == 'containment':
+        # share of the smaller (later) box covered by the larger one
+        hit |= inter / np.maximum(area[v], 1).astype(np.float64) >= containment
+    return [boxes[k] for k in _greedy(order, a[hit], v[hit])]
+
+
+def _soft(order, i, j, iou, sigma: float, score_threshold: float) -> List[int]:
+    n = len(order)
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    neighbours = [[] for _ in range(n)]
+    for a, c, o in zip(i.tolist(), j.tolist(), iou.tolist()):
+        neighbours[a].append((c, o))
+        neighbours[c].append((a, o))
+    score = [1.0] * n
+    # max-heap on score, ties broken by area rank; stale entries are skipped
+    heap = [(-1.0, int(rank[k]), k) for k in range(n)]
+    heapq.heapify(heap)
+    done = [False] * n
+    out = []
+    while heap:
+        s, _, k = heapq.heappop(heap)
+        if done[k] or -s != score[k]:
+            continue
+        done[k] = True
+        if score[k] < score_threshold:
+            continue
+        out.append(k)
+        for c, o in neighbours[k]:
+            if not done[c]:
+                score[c] *= math.exp(-(o * o) / sigma)
+                heapq.heappush(heap, (-score[c], int(rank[c]), c))
+    return out
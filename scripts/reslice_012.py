@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import os
-from PIL import Image
+
+import build_cache
+from slice_assets import export_crops
 
 IN_PATH = os.path.join('UIDESIGN', '登录页.png')
 OUT_PATH = os.path.join('miniprogram', 'assets', 'login', 'slice_012.png')
@@ -18,16 +20,13 @@ Y2 = CENTER_Y + NEW_H // 2
 def main():
     if not os.path.exists(IN_PATH):
         raise FileNotFoundError(f'Input not found: {IN_PATH}')
-    img = Image.open(IN_PATH).convert('RGB')
-    w, h = img.size
-    x1 = max(0, min(w, X1))
-    y1 = max(0, min(h, Y1))
-    x2 = max(0, min(w, X2))
-    y2 = max(0, min(h, Y2))
-    crop = img.crop((x1, y1, x2, y2))
-    os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
-    crop.save(OUT_PATH)
-    print(f'Saved: {OUT_PATH} [{x1},{y1},{x2-x1},{y2-y1}]')
+    out_dir, name = os.path.split(OUT_PATH)
+    os.makedirs(out_dir, exist_ok=True)
+    cache = build_cache.BuildCache(out_dir)
+    meta = export_crops(build_cache.LazySource(IN_PATH), cache, [(name, [X1, Y1, X2 - X1, Y2 - Y1])])
+    cache.save()
+    x, y, w, h = meta[0]['bbox']
+    print(f'Saved: {OUT_PATH} [{x},{y},{w},{h}]')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
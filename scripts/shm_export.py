@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Parallel slice encoding from one shared-memory copy of the decoded design.
+
+``SharedImage`` copies the decoded design once into a
+``multiprocessing.shared_memory`` block. Worker processes attach to that
+block by name and wrap it in a NumPy array without copying, so a crop is a
+view (``arr[y1:y2, x1:x2]``) and the only per-slice buffer is the one the
+encoder itself needs for the crop being encoded. Work is sent as
+(name, box, spec) tuples and encoded bytes come back, so memory stays flat
+however many slices or workers there are: one frame in shared memory plus
+one crop per busy worker.
+
+    with SharedImage(np.asarray(src.image)) as shared:
+        results = encode_regions(shared, [(name, (x1, y1, x2, y2), spec), ...], processes=4)
+
+``results`` has the same entries as ``encoders.encode_many``.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import encoders
+import slice_trace
+
+Box = Tuple[int, int, int, int]
+
+
+class SharedImage:
+    """An image array in a shared-memory block; ``handle`` lets other processes attach."""
+
+    def __init__(self, array: np.ndarray):
+        array = np.asarray(array)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self.array = np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf)
+        self.array[...] = array
+        self.handle = (self._shm.name, array.shape, array.dtype.str)
+
+    def view(self, box: Box) -> np.ndarray:
+        x1, y1, x2, y2 = box
+        return self.array[y1:y2, x1:x2]
+
+    def close(self):
+        if self._shm is not None:
+            self.array = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def attach(handle) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    # pool workers share the creator's resource tracker, so attaching registers
+    # nothing new and the block is unlinked only by SharedImage.close()
+    name, shape, dtype = handle
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+_worker = None
+
+
+def _init_worker(handle):
+    global _worker
+    _worker = attach(handle)
+
+
+def _encode_region(task) -> dict:
+    name, (x1, y1, x2, y2), spec = task
+    return encoders._encode_one((name, _worker[1][y1:y2, x1:x2], spec))
+
+
+def encode_regions(shared: SharedImage, tasks: Iterable[Tuple[str, Box, Optional[dict]]],
+                   processes: int = None) -> List[dict]:
+    """Encode (name, box, spec) crops of ``shared`` in worker processes, preserving order."""
+    tasks = list(tasks)
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    pixels = sum((x2 - x1) * (y2 - y1) for _, (x1, y1, x2, y2), _ in tasks)
+    with slice_trace.span('encode', images=len(tasks), pixels=pixels, processes=processes) as sp:
+        if processes <= 1:
+            results = [encoders._encode_one((name, shared.view(box), spec)) for name, box, spec in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(shared.handle,)) as pool:
+                results = list(pool.map(_encode_region, tasks))
+        sp.set(bytes_before=encoders.total_before(results), bytes=sum(r["after"] for r in results))
+    return results
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Crop/export helpers shared by the slice scripts and slice_pipeline."""
+from typing import Iterable, List, Optional
+
+import encoders
+import slice_trace
+
+
+def clamp_bbox(w, h, x, y, bw, bh):
+    x1 = max(0, min(w, x))
+    y1 = max(0, min(h, y))
+    x2 = max(0, min(w, x + bw))
+    y2 = max(0, min(h, y + bh))
+    return x1, y1, x2, y2
+
+
+def encode_spec(encode: Optional[dict], name: str) -> dict:
+    """Encoder spec for ``name`` from {"default": spec, "assets": {name: spec}}."""
+    encode = encode or {}
+    spec = dict(encode.get('default') or {})
+    spec.update(encode.get('assets', {}).get(name) or {})
+    return encoders.resolve_spec(spec)
+
+
+def export_crops(src, cache, slices: Iterable, encode: Optional[dict] = None,
+                 workers: int = None, verbose: bool = True, processes: int = None) -> List[dict]:
+    """Export ``slices`` ((name, bbox) pairs or {"name", "bbox"} dicts) and return their metadata.
+
+    Only slices whose cached output is stale are cropped; those are encoded
+    in parallel. Crops are views into ``src.array``, copied only by the
+    encoder working on them. With ``processes`` the design goes into shared
+    memory once and worker processes encode from it (see shm_export).
+    Metadata names are the files actually written, which differ from the
+    requested name when an encoder switches format.
+    """
+    W, H = src.size
+    meta = []
+    stale = []
+    for s in slices:
+        name, bbox = (s['name'], s['bbox']) if isinstance(s, dict) else s
+        x, y, bw, bh = bbox
+        x1, y1, x2, y2 = clamp_bbox(W, H, x, y, bw, bh)
+        spec = encode_spec(encode, name)
+        key = src.output_key(crop=[x1, y1, x2, y2], encode=spec)
+        if not cache.is_fresh(name, key):
+            stale.append((name, key, (x1, y1, x2, y2), spec))
+        meta.append({"name": name, "bbox": [int(x1), int(y1), int(x2 - x1), int(y2 - y1)]})
+
+    slice_trace.count('crops', requested=len(meta), stale=len(stale))
+    if stale:
+        if processes and processes > 1 and len(stale) > 1:
+            import shm_export
+            with shm_export.SharedImage(src.array) as shared:
+                results = shm_export.encode_regions(shared, [(name, box, spec) for name, _, box, spec in stale],
+                                                    processes)
+        else:
+            arr = src.array
+            crops = [(name, arr[y1:y2, x1:x2], spec) for name, _, (x1, y1, x2, y2), spec in stale]
+            results = encoders.encode_many(crops, workers)
+        for (name, key, _, _), r in zip(stale, results):
+            cache.write(name, key, r["data"], r["name"])
+        if verbose:
+            encoders.report(results)
+    for m in meta:
+        shared = cache.shared_file(m["name"])
+        m["name"] = cache.file_for(m["name"])
+        if shared:
+            # folded into an identical slice by dedup_slices; the page loads that file
+            m["src"] = shared
+    return meta
+
+
+def export_design(src, cache, name: str = 'design.png', encode: Optional[dict] = None) -> str:
+    # the whole design, used as the alignment background in the page
+    spec = encode_spec(encode, name)
+    key = src.output_key(design=True, encode=spec)
+    if not cache.is_fresh(name, key):
+        cache.save_image(name, key, src.image, spec)
+    return cache.file_for(name)
+
+
+def canvas_config_js(w: int, h: int) -> str:
+    return f"module.exports = {{ designW: {w}, designH: {h} }}\n"
+
+
+def find_bbox(meta: List[dict], name: str):
+    for s in meta:
+        if s['name'] == name:
+            return s['bbox']
+    return None
@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 import os, json
-from PIL import Image
+import argparse
+
+import build_cache
+import wxml_codegen
+from slice_assets import canvas_config_js, export_crops, export_design
+from wxml_codegen import style_rect
 
 IN_PATH = os.path.join('UIDESIGN', '登录页.png')
 OUT_DIR = os.path.join('miniprogram', 'assets', 'login')
@@ -19,6 +24,13 @@ DESIGN_BG_PATH = os.path.join('miniprogram', 'assets', 'login', 'design.png')
 # 6) 登录按钮含背景（完整按钮块）
 # 7) 手机号快捷登录
 
+CANVAS = {
+    "canvas_class": "design-canvas {{debug?'debug':''}}",
+    "canvas_style": "width: {{designW}}px; height: {{designH}}px; transform: scale({{designScale}}); transform-origin: left top;",
+}
+# 点击层：登录按钮与注册标签
+BUTTONS = [("c7_login_button.png", "btn-login", "onSubmit"), ("c7_register_label.png", "btn-register", "onRegister")]
+
 DEFAULT_SLICES = [
     {"name": "c7_above_buttons.png",   "bbox": [0, 1160, 786, 380]},
     {"name": "c7_login_label.png",     "bbox": [260, 1548, 160, 56]},
@@ -29,30 +41,17 @@ DEFAULT_SLICES = [
     {"name": "c7_phone_quick.png",     "bbox": [80, 920, 260, 60]},
 ]
 
-def clamp_bbox(w, h, x, y, bw, bh):
-    x1 = max(0, min(w, x))
-    y1 = max(0, min(h, y))
-    x2 = max(0, min(w, x + bw))
-    y2 = max(0, min(h, y + bh))
-    return x1, y1, x2, y2
-
-def main():
-    if not os.path.exists(IN_PATH):
-        raise FileNotFoundError(f'Input not found: {IN_PATH}')
-    img = Image.open(IN_PATH).convert('RGB')
-    W, H = img.size
-    os.makedirs(OUT_DIR, exist_ok=True)
-
+def load_slices(W, path=CFG_PATH):
     # 读取自定义坐标配置（如存在）
     slices_cfg = None
-    if os.path.exists(CFG_PATH):
+    if os.path.exists(path):
         try:
-            with open(CFG_PATH, 'r', encoding='utf-8') as cf:
+            with open(path, 'r', encoding='utf-8') as cf:
                 data = json.load(cf)
                 slices_cfg = data.get('slices')
         except Exception as e:
-            print(f'[warn] 读取 {CFG_PATH} 失败，使用默认坐标: {e}')
-    SLICES = slices_cfg if slices_cfg else DEFAULT_SLICES
+            print(f'[warn] 读取 {path} 失败，使用默认坐标: {e}')
+    SLICES = json.loads(json.dumps(slices_cfg if slices_cfg else DEFAULT_SLICES))
 
     # 若未提供或需要动态计算“上方区域”，根据 登录/注册 文本的最小 top 自动推导
     names = [s['name'] for s in SLICES]
@@ -74,55 +73,47 @@ def main():
                 if s['name'] == 'c7_above_buttons.png':
                     s['bbox'] = auto_above['bbox']
                     break
+    return SLICES
+
+def render_wxml(meta, W, H):
+    # 生成区域：仅渲染自定义7个切片；登录/注册添加点击层（页面骨架见 wxml_codegen.PAGE）
+    # 背景整图（便于核对切片位置）
+    blocks = [wxml_codegen.DESIGN_BG.substitute(src='design.png', style=style_rect(0, 0, W, H))]
+    blocks += wxml_codegen.slice_elements(meta)
+    blocks += wxml_codegen.button_elements(meta, BUTTONS)
+    return wxml_codegen.indent(blocks) + '\n'
 
-    meta = []
-    for s in SLICES:
-        name = s['name']
-        x, y, bw, bh = s['bbox']
-        x1, y1, x2, y2 = clamp_bbox(W, H, x, y, bw, bh)
-        crop = img.crop((x1, y1, x2, y2))
-        crop.save(os.path.join(OUT_DIR, name))
-        meta.append({"name": name, "bbox": [int(x1), int(y1), int(x2 - x1), int(y2 - y1)]})
+def slices_json(meta, W, H, in_path=IN_PATH):
+    return json.dumps({"input": in_path, "canvas_size": [W, H], "count": len(meta), "slices": meta},
+                      ensure_ascii=False, indent=2)
 
-    with open(OUT_JSON, 'w', encoding='utf-8') as f:
-        json.dump({"input": IN_PATH, "canvas_size": [W, H], "count": len(meta), "slices": meta}, f, ensure_ascii=False, indent=2)
+def main():
+    parser = argparse.ArgumentParser(description='Slice the custom 7-slice login page.')
+    parser.add_argument('--init', action='store_true',
+                        help='adopt a login.wxml without generated markers: its design-canvas children are replaced')
+    args = parser.parse_args()
+
+    if not os.path.exists(IN_PATH):
+        raise FileNotFoundError(f'Input not found: {IN_PATH}')
+    # 先计算源图哈希，仅在有切片需要重新生成时才解码
+    src = build_cache.LazySource(IN_PATH)
+    cache = build_cache.BuildCache(OUT_DIR)
+    W, H = src.size
+    os.makedirs(OUT_DIR, exist_ok=True)
+
+    meta = export_crops(src, cache, load_slices(W))
+
+    build_cache.write_text_if_changed(OUT_JSON, slices_json(meta, W, H))
 
     # 生成 JS 画布配置（供页面读取设计尺寸）
-    os.makedirs(os.path.dirname(CANVAS_CFG_JS), exist_ok=True)
-    with open(CANVAS_CFG_JS, 'w', encoding='utf-8') as cf:
-        cf.write(f"module.exports = {{ designW: {W}, designH: {H} }}\n")
+    build_cache.write_text_if_changed(CANVAS_CFG_JS, canvas_config_js(W, H))
 
     # 输出整图作为对齐参考背景
-    img.save(DESIGN_BG_PATH)
+    export_design(src, cache, os.path.relpath(DESIGN_BG_PATH, OUT_DIR))
+    cache.save()
 
-    # 生成页面：仅渲染自定义7个切片；登录/注册添加点击层
-    lines = []
-    lines.append('<view class="page login-page">')
-    lines.append('  <view class="design-canvas {{debug?\'debug\':\'\'}}" style="width: {{designW}}px; height: {{designH}}px; transform: scale({{designScale}}); transform-origin: left top;">')
-    # 背景整图（便于核对切片位置）
-    lines.append(f'    <image class="slice design-bg" src="/assets/login/design.png" style="left:0px; top:0px; width:{W}px; height:{H}px"/>')
-    for s in meta:
-        name = s['name']
-        x, y, w, h = s['bbox']
-        lines.append(f'    <image class="slice" src="/assets/login/{name}" style="left:{x}px; top:{y}px; width:{w}px; height:{h}px"/>')
-    # 点击层：登录按钮与注册标签
-    def find_bbox(n):
-        for s in meta:
-            if s['name'] == n:
-                return s['bbox']
-        return None
-    for n, cls, tap in [("c7_login_button.png", "btn-login", "onSubmit"), ("c7_register_label.png", "btn-register", "onRegister")]:
-        bbox = find_bbox(n)
-        if bbox:
-            x, y, w, h = bbox
-            lines.append(f'    <view class="btn {cls}" style="left:{x}px; top:{y}px; width:{w}px; height:{h}px" bindtap="{tap}"></view>')
-    lines.append('  </view>')
-    lines.append('</view>')
-
-    os.makedirs(os.path.dirname(OUT_WXML), exist_ok=True)
-    with open(OUT_WXML, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(lines) + '\n')
-    print(f'Custom7 slices written: {OUT_JSON}; WXML updated: {OUT_WXML}')
+    wxml_codegen.write_wxml(OUT_WXML, render_wxml(meta, W, H), init=args.init, **CANVAS)
+    print(f'Custom7 slices written: {OUT_JSON}; WXML updated: {OUT_WXML}; assets: {cache.summary()}')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
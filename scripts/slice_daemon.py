@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""Local slicing daemon: crop / detect / align / overlay over localhost HTTP.
+
+Keeps decoded designs and derived arrays (grayscale, edge maps, labelled
+components, region statistics tables, template-matching pyramids and layer
+matches) in an LRU cache bounded by ``--max-mb``, so repeated requests
+against the same design skip Python start-up, imports, PNG decoding and the
+full-page passes. Entries are keyed by path + mtime + size, so an edited
+design is decoded afresh. Values are computed outside the cache lock, so a
+slow request does not hold up the others; concurrent requests for the same
+entry wait for one computation.
+
+Every operation is a POST with ``Content-Type: application/json`` (a web
+page cannot send that cross-site without a CORS preflight, which the daemon
+never grants) and a JSON body; paths are relative to the daemon's working
+directory, and ``out`` files must resolve inside it. ``--token`` also
+requires an ``X-Slice-Token`` header on every request.
+
+  /crop     {"image", "bbox": [x, y, w, h], "out"?, "encode"?}  -> PNG bytes, or writes "out"
+  /detect   {"image", "mode": "boxes" | "purple", "min_fill"?, "element_size"?, "element_shape"?, "nms_mode"?,
+             "density"? (default: the @Nx file name suffix), "pyramid"?}
+  /align    {"image", "layers_dir"?, "layers"?, "min_score"?}
+  /overlay  {"image", "config" (path or dict), "out"?}
+  /stats    {"image", "bbox" | "boxes", "refine"?, "pad"?}  -> region_stats scores (+ refined boxes)
+GET /status reports cache usage; POST /shutdown stops the daemon.
+
+Usage: python3 scripts/slice_daemon.py [--port 8765] [--max-mb 512] [--token SECRET]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+import build_cache
+import encoders
+import region_stats
+import slice_login
+import template_align
+from auto_align_interactive import detect_largest_purple_rect
+from generate_alignment_overlay import draw_overlay
+from slice_assets import clamp_bbox
+
+DEFAULT_PORT = 8765
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, region_stats.RegionStats):
+        return sum(a.nbytes for a in (value.gray, value.gray_sq, value.edges, value.rgb))
+    if isinstance(value, template_align.PageMatcher):
+        arrays = list(value.gray) + [a for pyr in value._keys.values() for a in pyr] + [value.rgb]
+        return sum(a.nbytes for a in arrays)
+    if isinstance(value, LayerMatches):
+        with value.lock:
+            return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(hits) + sum(map(sys.getsizeof, hits))
+                                              for k, hits in value.items())
+    if isinstance(value, dict) and all(isinstance(v, np.ndarray) for v in value.values()):
+        # slice_login.component_stats
+        return sum(v.nbytes for v in value.values())
+    return sys.getsizeof(value)
+
+
+class LayerMatches(dict):
+    """(layer, count) -> template matches on one design; grows as /align requests more layers."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+
+
+class LRUCache:
+    """Byte-bounded LRU of computed values; ``get`` computes and inserts on a miss.
+
+    The lock only guards the bookkeeping: ``factory`` runs without it, and
+    other threads asking for a key being computed wait on its future.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def get(self, key, factory):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            future = self.pending.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self.pending[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = factory()
+        except BaseException as e:
+            with self.lock:
+                del self.pending[key]
+            future.set_exception(e)
+            raise
+        size = _nbytes(value)
+        with self.lock:
+            del self.pending[key]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            self._evict()
+        future.set_result(value)
+        return value
+
+    def resize(self, key):
+        # values that grow after insertion (PageMatcher colour keys, LayerMatches) re-measure here
+        with self.lock:
+            if key in self.entries:
+                value, size = self.entries[key]
+                new = _nbytes(value)
+                self.entries[key] = (value, new)
+                self.bytes += new - size
+                self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+
+    def status(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "keys": [list(k) for k in self.entries]}
+
+
+class Designs:
+    """Decoded designs and their derived arrays, all through one LRU cache."""
+
+    def __init__(self, cache: LRUCache):
+        self.cache = cache
+
+    @staticmethod
+    def _version(path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'Input not found: {path}')
+        st = os.stat(path)
+        return path, st.st_mtime_ns, st.st_size
+
+    def get(self, path: str, kind):
+        # ``kind``: a name below, or a tuple starting with one plus its parameters
+        key = self._version(path) + (kind,)
+        return self.cache.get(key, lambda: self._compute(path, kind))
+
+    def _compute(self, path: str, kind):
+        if isinstance(kind, tuple) and kind[0] == 'components':
+            # dilated + labelled edge map for (element_size, element_shape)
+            _, element_size, element_shape = kind
+            return slice_login.component_stats(self.get(path, 'rgb'), element_size, element_shape,
+                                               edges=self.get(path, 'edges'))
+        if isinstance(kind, tuple) and kind[0] == 'matches':
+            # filled in by op_align; the layer source's version is part of the kind so
+            # edited layers are matched afresh
+            return LayerMatches()
+        if kind == 'image':
+            return Image.open(path).convert('RGB')
+        if kind == 'rgb':
+            return np.asarray(self.get(path, 'image'))
+        if kind == 'gray':
+            return slice_login._to_gray(self.get(path, 'rgb'))
+        if kind == 'edges':
+            return slice_login._edges_binary(self.get(path, 'gray'))
+        if kind == 'regions':
+            return region_stats.RegionStats(self.get(path, 'rgb'))
+        if kind == 'matcher':
+            return template_align.PageMatcher(self.get(path, 'image'))
+        raise ValueError(f'unknown derived array: {kind!r}')
+
+
+def out_path(path: str) -> str:
+    """``path`` if it resolves inside the daemon's working directory, else PermissionError."""
+    root = os.path.realpath(os.getcwd())
+    if os.path.commonpath([os.path.realpath(path), root]) != root:
+        raise PermissionError(f'out path outside {root}: {path}')
+    return path
+
+
+def op_crop(designs: Designs, req: dict):
+    img = designs.get(req['image'], 'image')
+    x1, y1, x2, y2 = clamp_bbox(img.width, img.height, *req['bbox'])
+    data, fmt = encoders.encode(img.crop((x1, y1, x2, y2)), req.get('encode'))
+    bbox = [x1, y1, x2 - x1, y2 - y1]
+    if req.get('out'):
+        out = out_path(encoders.output_name(req['out'], fmt))
+        changed = build_cache.write_if_changed(out, data)
+        return {"name": out, "bbox": bbox, "bytes": len(data), "changed": changed}
+    return data, f'image/{fmt}'
+
+
+def op_detect(designs: Designs, req: dict):
+    path = req['image']
+    if req.get('mode', 'boxes') == 'purple':
+        return {"bbox": detect_largest_purple_rect(designs.get(path, 'image'))}
+    options = {k: req[k] for k in ('min_fill', 'nms_mode') if k in req}
+    element = req.get('element_size', 3)
+    element = tuple(element) if isinstance(element, list) else element
+    shape = req.get('element_shape', 'rect')
+    # same density default as slice_login.py: the design's @Nx suffix
+    density = req.get('density') or slice_login.density_from_name(path)
+    pyramid = bool(req.get('pyramid')) and (density or slice_login.REFERENCE_DENSITY) >= 2 * slice_login.LEVEL_DENSITY
+    if pyramid:
+        # works on its own downsampled level; the full-resolution components would go unused
+        boxes = slice_login.find_candidate_boxes(designs.get(path, 'rgb'), element_size=element, element_shape=shape,
+                                                 density=density, pyramid=True, **options)
+    else:
+        components = designs.get(path, ('components', element, shape))
+        boxes = slice_login.find_candidate_boxes(designs.get(path, 'rgb'), density=density,
+                                                 components=components, **options)
+    return {"boxes": [list(b) for b in boxes]}
+
+
+def op_align(designs: Designs, req: dict):
+    path = req['image']
+    layers_version = Designs._version(req.get('layers_dir', template_align.LAYERS_DIR))
+    layers = designs.cache.get(('layers',) + layers_version, lambda: template_align.load_layers(layers_version[0]))
+    found = designs.get(path, ('matches',) + layers_version)
+    matcher = designs.get(path, 'matcher')
+    # align_layers fills in a private copy; new matches are merged back under the lock
+    with found.lock:
+        known = dict(found)
+    bboxes = template_align.align_layers(designs.get(path, 'image'), layers, req.get('layers'),
+                                         req.get('min_score', 0.5), matcher=matcher, found=known)
+    if len(known) > len(found):
+        with found.lock:
+            found.update(known)
+        designs.cache.resize(Designs._version(path) + (('matches',) + layers_version,))
+    designs.cache.resize(Designs._version(path) + ('matcher',))
+    return {"bboxes": bboxes, "inputs": template_align.derive_inputs(bboxes)}
+
+
+def op_overlay(designs: Designs, req: dict):
+    cfg = req['config']
+    if isinstance(cfg, str):
+        with open(cfg, 'r', encoding='utf-8') as f:
+            cfg = json.load(f)
+    out_img = draw_overlay(designs.get(req['image'], 'image'), cfg)
+    data, fmt = encoders.encode(out_img, req.get('encode', {"optimize": False}))
+    if req.get('out'):
+        changed = build_cache.write_if_changed(out_path(req['out']), data)
+        return {"name": req['out'], "bytes": len(data), "changed": changed}
+    return data, f'image/{fmt}'
+
+
+def op_stats(designs: Designs, req: dict):
+    stats = designs.get(req['image'], 'regions')
+    boxes = req['boxes'] if 'boxes' in req else [req['bbox']]
+    out = {k: v.tolist() for k, v in stats.score(boxes).items()}
+    if req.get('refine'):
+        out["refined"] = stats.refine(boxes, req.get('pad', region_stats.PAD)).tolist()
+    return out
+
+
+OPS = {"crop": op_crop, "detect": op_detect, "align": op_align, "overlay": op_overlay, "stats": op_stats}
+
+
+class Handler(BaseHTTPRequestHandler):
+    designs: Designs = None
+    token: str = None
+
+    def _send(self, code: int, body, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _refused(self, post: bool) -> bool:
+        # rejects requests a web page in the user's browser could forge
+        host = (self.headers.get('Host') or '').rsplit(':', 1)[0]
+        if host not in ('127.0.0.1', 'localhost'):
+            # DNS rebinding: another site's name pointed at 127.0.0.1
+            self._send(403, {"error": f'unexpected Host {host!r}'})
+            return True
+        if self.token and self.headers.get('X-Slice-Token') != self.token:
+            self._send(403, {"error": 'missing or wrong X-Slice-Token'})
+            return True
+        content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        if post and content_type != 'application/json':
+            self._send(415, {"error": 'Content-Type must be application/json'})
+            return True
+        return False
+
+    def do_GET(self):
+        if self._refused(post=False):
+            return
+        if self.path.rstrip('/') == '/status':
+            self._send(200, self.designs.cache.status())
+        else:
+            self._send(404, {"error": f'unknown path {self.path}'})
+
+    def do_POST(self):
+        if self._refused(post=True):
+            return
+        op = self.path.strip('/')
+        if op == 'shutdown':
+            self._send(200, {"ok": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if op not in OPS:
+            self._send(404, {"error": f'unknown operation {op!r}'})
+            return
+        t0 = time.perf_counter()
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            req = json.loads(self.rfile.read(length) or b'{}')
+            result = OPS[op](self.designs, req)
+        except PermissionError as e:
+            self._send(403, {"error": str(e)})
+            return
+        except (OSError, KeyError, ValueError, TypeError) as e:
+            self._send(400, {"error": f'{type(e).__name__}: {e}'})
+            return
+        ms = (time.perf_counter() - t0) * 1000
+        if isinstance(result, tuple):
+            self._send(200, result[0], result[1])
+        else:
+            result["ms"] = round(ms, 2)
+            self._send(200, result)
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+
+def call(op: str, payload: dict = None, port: int = DEFAULT_PORT, timeout: float = 60.0, token: str = None):
+    """Client helper: POST ``payload`` to a running daemon; JSON results are decoded."""
+    body = json.dumps(payload or {}, ensure_ascii=False).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['X-Slice-Token'] = token
+    req = urllib.request.Request(f'http://127.0.0.1:{port}/{op}', data=body, headers=headers)
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        data = resp.read()
+        if resp.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(data)
+        return data
+
+
+def serve(port: int = DEFAULT_PORT, max_mb: int = 512, verbose: bool = False, token: str = None):
+    Handler.designs = Designs(LRUCache(max_mb << 20))
+    Handler.token = token
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.verbose = verbose
+    print(f'Slice daemon on http://127.0.0.1:{port} (cache {max_mb} MB)', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve crop/detect/align/overlay over localhost HTTP.')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-mb', type=int, default=512, help='memory cap for cached images and arrays')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every request')
+    parser.add_argument('--token', default=os.environ.get('SLICE_DAEMON_TOKEN'),
+                        help='require this X-Slice-Token header (default: $SLICE_DAEMON_TOKEN)')
+    args = parser.parse_args()
+    serve(args.port, args.max_mb, args.verbose, args.token)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 import os, json
-from PIL import Image
+import argparse
+
+import build_cache
+from atlas import build_atlas
+import wxml_codegen
+from slice_assets import canvas_config_js, export_crops, export_design
+from wxml_codegen import style_rect
 
 IN_PATH = os.path.join('UIDESIGN', '登录页.png')
 OUT_DIR = os.path.join('miniprogram', 'assets', 'login')
@@ -9,6 +15,7 @@ OUT_WXML = os.path.join('miniprogram', 'pages', 'login', 'login.wxml')
 OUT_WXSS = os.path.join('miniprogram', 'pages', 'login', 'login.wxss')
 CANVAS_CFG_JS = os.path.join('miniprogram', 'pages', 'login', 'canvas-config.js')
 CFG_PATH = os.path.join('scripts', 'interactive_config.json')
+ATLAS_NAME = 'login_atlas.png'
 
 DEFAULT_CFG = {
   "bboxes": {
@@ -27,133 +34,116 @@ DEFAULT_CFG = {
   }
 }
 
-def clamp_bbox(w, h, x, y, bw, bh):
-    x1 = max(0, min(w, x))
-    y1 = max(0, min(h, y))
-    x2 = max(0, min(w, x + bw))
-    y2 = max(0, min(h, y + bh))
-    return x1, y1, x2, y2
+CANVAS = {
+    "canvas_class": "design-canvas {{debug?'debug':''}}",
+    "canvas_style": "width: {{designW}}px; height: {{designH}}px; transform: scale({{designScale}}); transform-origin: left top;",
+}
+BUTTONS = [('login_button_bg.png', 'btn-login', 'onSubmit'),
+           ('register_label.png', 'btn-register', 'onRegister'),
+           ('phone_quick_label.png', 'btn-phone', 'onPhoneQuick')]
 
-def crop(img, w, h, bbox):
-    x, y, bw, bh = bbox
-    x1, y1, x2, y2 = clamp_bbox(w, h, x, y, bw, bh)
-    return img.crop((x1, y1, x2, y2)), (x1, y1, x2-x1, y2-y1)
+SLICE_KEYS = ['top_area', 'register_label', 'login_button_bg', 'phone_quick_label',
+              'username_bg', 'password_bg', 'privacy_text']
 
-def main():
-    if not os.path.exists(IN_PATH):
-        raise FileNotFoundError(f'Input not found: {IN_PATH}')
-    os.makedirs(OUT_DIR, exist_ok=True)
-    img = Image.open(IN_PATH).convert('RGB')
-    W, H = img.size
+WXSS_ADDITIONS = '''
+.design-canvas { position: relative; margin: 0 auto; overflow: hidden; }
+.slice { position: absolute; pointer-events: none; }
+.atlas-slice { overflow: hidden; }
+.atlas-img { position: absolute; }
+.abs-input { position: absolute; z-index: 12; background: transparent; border: none; padding: 6px 10px; font-size: 14px; color: #111; }
+.btn { position: absolute; z-index: 10; }
+.agree-box { position: absolute; z-index: 11; border: 1px solid #aaa; border-radius: 4px; }
+.agree-inner { width: 100%; height: 100%; background: transparent; }
+.agree-inner.on { background: #07c160; }
+.design-canvas.debug .slice { outline: 1px dashed rgba(0, 128, 255, 0.4); }
+.design-canvas.debug .btn, .design-canvas.debug .agree-box { outline: 1px dashed rgba(255, 0, 0, 0.5); }
+'''
+# appended unmarked by earlier versions of this script on every run; update_wxss strips every copy
+LEGACY_WXSS = ('''
+.design-canvas { position: relative; margin: 0 auto; overflow: hidden; }
+.slice { position: absolute; pointer-events: none; }
+.abs-input { position: absolute; z-index: 12; background: transparent; border: none; padding: 6px 10px; font-size: 14px; color: #111; }
+.btn { position: absolute; z-index: 10; }
+.agree-box { position: absolute; z-index: 11; border: 1px solid #aaa; border-radius: 4px; }
+.agree-inner { width: 100%; height: 100%; background: transparent; }
+.agree-inner.on { background: #07c160; }
+.design-canvas.debug .slice { outline: 1px dashed rgba(0, 128, 255, 0.4); }
+.design-canvas.debug .btn, .design-canvas.debug .agree-box { outline: 1px dashed rgba(255, 0, 0, 0.5); }
+''',)
 
-    # load config
-    cfg = DEFAULT_CFG
-    if os.path.exists(CFG_PATH):
+def load_config(path=CFG_PATH):
+    cfg = json.loads(json.dumps(DEFAULT_CFG))
+    if os.path.exists(path):
         try:
-            with open(CFG_PATH, 'r', encoding='utf-8') as f:
+            with open(path, 'r', encoding='utf-8') as f:
                 file_cfg = json.load(f)
                 for k in ('bboxes','inputs'):
                     if k in file_cfg:
                         cfg[k] = file_cfg[k]
         except Exception as e:
-            print(f'[warn] failed to read {CFG_PATH}: {e}')
+            print(f'[warn] failed to read {path}: {e}')
+    return cfg
+
+def slice_plan(cfg):
+    b = cfg['bboxes']
+    return [(f'{key}.png', b[key]) for key in SLICE_KEYS]
 
+def render_wxml(meta, cfg, W, H, atlas=None):
+    # generated region of login.wxml (see wxml_codegen.py)
     b = cfg['bboxes']
     i = cfg['inputs']
+    blocks = [wxml_codegen.DESIGN_BG.substitute(src='design.png', style=style_rect(0, 0, W, H))]
+    blocks += wxml_codegen.slice_elements(meta, atlas)
+    blocks.append(wxml_codegen.INPUT.substitute(style=style_rect(*i['username']), placeholder='请输入用户名',
+                                                extra='', field='username'))
+    blocks.append(wxml_codegen.INPUT.substitute(style=style_rect(*i['password']), placeholder='请输入密码',
+                                                extra=' password="true"', field='password'))
+    # click overlays: login, register, phone quick, privacy checkbox
+    blocks += wxml_codegen.button_elements(meta, BUTTONS)
+    blocks.append(wxml_codegen.CHECKBOX.substitute(style=style_rect(*b['privacy_checkbox'])))
+    return wxml_codegen.indent(blocks) + '\n'
 
-    # crop slices
-    meta = []
-    to_crop = [
-        ('top_area.png', b['top_area']),
-        ('register_label.png', b['register_label']),
-        ('login_button_bg.png', b['login_button_bg']),
-        ('phone_quick_label.png', b['phone_quick_label']),
-        ('username_bg.png', b['username_bg']),
-        ('password_bg.png', b['password_bg']),
-        ('privacy_text.png', b['privacy_text'])
-    ]
-    for name, bbox in to_crop:
-        patch, real = crop(img, W, H, bbox)
-        patch.save(os.path.join(OUT_DIR, name))
-        meta.append({"name": name, "bbox": [int(real[0]), int(real[1]), int(real[2]), int(real[3])]})
+def render_wxss(base):
+    # keep the stylesheet's own rules; only the marked region is (re)generated
+    return wxml_codegen.update_wxss(base, WXSS_ADDITIONS, legacy=LEGACY_WXSS)
 
-    # export whole design for alignment
-    img.save(os.path.join(OUT_DIR, 'design.png'))
-
-    with open(OUT_JSON, 'w', encoding='utf-8') as f:
-        json.dump({"input": IN_PATH, "canvas_size": [W, H], "count": len(meta), "slices": meta, "inputs": i}, f, ensure_ascii=False, indent=2)
-
-    # canvas config
-    os.makedirs(os.path.dirname(CANVAS_CFG_JS), exist_ok=True)
-    with open(CANVAS_CFG_JS, 'w', encoding='utf-8') as cf:
-        cf.write(f"module.exports = {{ designW: {W}, designH: {H} }}\n")
-
-    # generate WXML
-    def style_rect(x,y,w,h):
-        return f'left:{x}px; top:{y}px; width:{w}px; height:{h}px'
-    def bbox_of(name):
-        for s in meta:
-            if s['name'] == name:
-                return s['bbox']
-        return None
-
-    lines = []
-    lines.append('<view class="page login-page">')
-    lines.append('  <view class="design-canvas {{debug?\'debug\':\'\'}}" style="width: {{designW}}px; height: {{designH}}px; transform: scale({{designScale}}); transform-origin: left top;">')
-    # background design image for alignment
-    lines.append(f'    <image class="slice design-bg" src="/assets/login/design.png" style="{style_rect(0,0,W,H)}"/>')
-    # render background slices
-    for s in meta:
-        name = s['name']
-        x, y, w, h = s['bbox']
-        lines.append(f'    <image class="slice" src="/assets/login/{name}" style="{style_rect(x,y,w,h)}"/>')
-    # inputs
-    ux,uy,uw,uh = i['username']
-    px,py,pw,ph = i['password']
-    lines.append(f'    <input class="abs-input" style="{style_rect(ux,uy,uw,uh)}" placeholder="请输入用户名" bindinput="onInput" data-field="username"/>')
-    lines.append(f'    <input class="abs-input" style="{style_rect(px,py,pw,ph)}" placeholder="请输入密码" password="true" bindinput="onInput" data-field="password"/>')
-    # click overlays: login, register, phone quick, privacy checkbox
-    for key, cls, tap in [
-        ('login_button_bg.png','btn-login','onSubmit'),
-        ('register_label.png','btn-register','onRegister'),
-        ('phone_quick_label.png','btn-phone','onPhoneQuick')
-    ]:
-        bbox = bbox_of(key)
-        if bbox:
-            x,y,w,h = bbox
-            lines.append(f'    <view class="btn {cls}" style="{style_rect(x,y,w,h)}" bindtap="{tap}"></view>')
-    cbx = b['privacy_checkbox']
-    cx,cy,cw,ch = cbx
-    lines.append(f'    <view class="agree-box" style="{style_rect(cx,cy,cw,ch)}" bindtap="toggleAgree">')
-    lines.append('      <view class="agree-inner {{agree?\'on\':\'\'}}"></view>')
-    lines.append('    </view>')
-    lines.append('  </view>')
-    lines.append('</view>')
-    os.makedirs(os.path.dirname(OUT_WXML), exist_ok=True)
-    with open(OUT_WXML, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(lines) + '\n')
-
-    # ensure WXSS contains needed classes (append minimal if missing)
-    # we do not overwrite existing styles; only ensure essentials
-    if os.path.exists(OUT_WXSS):
-        base = open(OUT_WXSS,'r',encoding='utf-8').read()
+def slices_json(meta, cfg, W, H, in_path=IN_PATH, atlas=None):
+    data = {"input": in_path, "canvas_size": [W, H], "count": len(meta), "slices": meta, "inputs": cfg['inputs']}
+    if atlas:
+        data["atlas"] = atlas
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description='Slice the interactive login page.')
+    parser.add_argument('--atlas', action='store_true', help=f'pack the slices into {ATLAS_NAME} instead of one PNG each')
+    parser.add_argument('--init', action='store_true',
+                        help='adopt a login.wxml without generated markers: its design-canvas children are replaced')
+    args = parser.parse_args()
+
+    if not os.path.exists(IN_PATH):
+        raise FileNotFoundError(f'Input not found: {IN_PATH}')
+    os.makedirs(OUT_DIR, exist_ok=True)
+    # hashed now, decoded only if some output is stale
+    src = build_cache.LazySource(IN_PATH)
+    cache = build_cache.BuildCache(OUT_DIR)
+    W, H = src.size
+
+    cfg = load_config()
+    atlas = None
+    if args.atlas:
+        meta, atlas = build_atlas(src, cache, slice_plan(cfg), ATLAS_NAME)
     else:
-        base = ''
-    additions = '''
-.design-canvas { position: relative; margin: 0 auto; overflow: hidden; }
-.slice { position: absolute; pointer-events: none; }
-.abs-input { position: absolute; z-index: 12; background: transparent; border: none; padding: 6px 10px; font-size: 14px; color: #111; }
-.btn { position: absolute; z-index: 10; }
-.agree-box { position: absolute; z-index: 11; border: 1px solid #aaa; border-radius: 4px; }
-.agree-inner { width: 100%; height: 100%; background: transparent; }
-.agree-inner.on { background: #07c160; }
-.design-canvas.debug .slice { outline: 1px dashed rgba(0, 128, 255, 0.4); }
-.design-canvas.debug .btn, .design-canvas.debug .agree-box { outline: 1px dashed rgba(255, 0, 0, 0.5); }
-'''
-    with open(OUT_WXSS,'w',encoding='utf-8') as wf:
-        wf.write(base + ('\n' if base and not base.endswith('\n') else '') + additions)
+        meta = export_crops(src, cache, slice_plan(cfg))
+    # export whole design for alignment
+    export_design(src, cache)
+    cache.save()
+
+    build_cache.write_text_if_changed(OUT_JSON, slices_json(meta, cfg, W, H, atlas=atlas))
+    build_cache.write_text_if_changed(CANVAS_CFG_JS, canvas_config_js(W, H))
+    wxml_codegen.write_wxml(OUT_WXML, render_wxml(meta, cfg, W, H, atlas), init=args.init, **CANVAS)
+    wxml_codegen.write_wxss(OUT_WXSS, WXSS_ADDITIONS, legacy=LEGACY_WXSS)
 
-    print(f'Interactive slices written: {OUT_JSON}; WXML/WXSS updated.')
+    print(f'Interactive slices written: {OUT_JSON}; WXML/WXSS updated. Assets: {cache.summary()}')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
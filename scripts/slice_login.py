@@ -1,12 +1,18 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import json
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import numpy as np
 from PIL import Image, ImageDraw
 
+import encoders
+import morphology
+import nms
+import slice_trace
+
 
 def ensure_dir(path: str):
     if not os.path.exists(path):
@@ -22,141 +28,475 @@ def _to_gray(img: np.ndarray) -> np.ndarray:
     return gray.astype(np.float32)
 
 
+def _shifted_terms(padded: np.ndarray, kernel: np.ndarray, out_shape: Tuple[int, int]) -> List[np.ndarray]:
+    # one full-frame product per kernel tap, in row-major kernel order
+    h, w = out_shape
+    kh, kw = kernel.shape
+    return [padded[dy:dy + h, dx:dx + w] * kernel[dy, dx] for dy in range(kh) for dx in range(kw)]
+
+
+def _pairwise_sum(terms: List[np.ndarray]) -> np.ndarray:
+    # Mirrors the summation order numpy uses when reducing a small contiguous
+    # float32 block (`region.sum()` in the former per-pixel loop), so results
+    # stay bit-identical: sequential below 8 terms, otherwise eight partial
+    # accumulators folded as a tree with the remainder added last.
+    n = len(terms)
+    if n < 8:
+        res = np.zeros_like(terms[0])
+        for t in terms:
+            res = res + t
+        return res
+    r = list(terms[:8])
+    full = n - n % 8
+    for i in range(8, full, 8):
+        for j in range(8):
+            r[j] = r[j] + terms[i + j]
+    res = ((r[0] + r[1]) + (r[2] + r[3])) + ((r[4] + r[5]) + (r[6] + r[7]))
+    for t in terms[full:]:
+        res = res + t
+    return res
+
+
 def _convolve2d(image: np.ndarray, kernel: np.ndarray) -> np.ndarray:
     kh, kw = kernel.shape
     pad_h, pad_w = kh // 2, kw // 2
     padded = np.pad(image, ((pad_h, pad_h), (pad_w, pad_w)), mode='edge')
-    out = np.zeros_like(image, dtype=np.float32)
-    for y in range(out.shape[0]):
-        for x in range(out.shape[1]):
-            region = padded[y:y+kh, x:x+kw]
-            out[y, x] = float((region * kernel).sum())
-    return out
+    terms = _shifted_terms(padded, kernel, image.shape)
+    return _pairwise_sum(terms).astype(np.float32, copy=False)
+
+
+SOBEL_X = np.array([[1, 0, -1], [2, 0, -2], [1, 0, -1]], dtype=np.float32)
+SOBEL_Y = np.array([[1, 2, 1], [0, 0, 0], [-1, -2, -1]], dtype=np.float32)
+EDGE_PERCENTILE = 85
+# box area limits, in px of a REFERENCE_DENSITY export (登录页.png is @2x);
+# other densities scale them by (density / REFERENCE_DENSITY) ** 2
+REFERENCE_DENSITY = 2
+MIN_AREA = 2000
+MEDIUM_AREA = 5000
+LARGE_AREA = 150000
+# pyramid mode detects on a level downsampled to about this density
+LEVEL_DENSITY = 1
+
+
+def _sobel_magnitude(gray: np.ndarray) -> np.ndarray:
+    return np.hypot(_convolve2d(gray, SOBEL_X), _convolve2d(gray, SOBEL_Y))
 
 
 def _edges_binary(gray: np.ndarray) -> np.ndarray:
-    kx = np.array([[1, 0, -1], [2, 0, -2], [1, 0, -1]], dtype=np.float32)
-    ky = np.array([[1, 2, 1], [0, 0, 0], [-1, -2, -1]], dtype=np.float32)
-    gx = _convolve2d(gray, kx)
-    gy = _convolve2d(gray, ky)
-    mag = np.hypot(gx, gy)
+    mag = _sobel_magnitude(gray)
     # threshold using percentile to adapt image contrast
-    t = np.percentile(mag, 85)
+    t = np.percentile(mag, EDGE_PERCENTILE)
     bin_edge = (mag >= t).astype(np.uint8)
     return bin_edge
 
 
-def _dilate(binary: np.ndarray, iterations: int = 1) -> np.ndarray:
-    kernel = np.ones((3, 3), dtype=np.uint8)
-    out = binary.copy()
-    for _ in range(iterations):
-        # convolution to count neighbors
-        kh, kw = kernel.shape
-        pad_h, pad_w = kh // 2, kw // 2
-        padded = np.pad(out, ((pad_h, pad_h), (pad_w, pad_w)), mode='constant')
-        acc = np.zeros_like(out, dtype=np.int32)
-        for y in range(out.shape[0]):
-            for x in range(out.shape[1]):
-                region = padded[y:y+kh, x:x+kw]
-                acc[y, x] = int((region * kernel).sum())
-        out = (acc > 0).astype(np.uint8)
-    return out
+def _strips(h: int, strip_height: int):
+    for y0 in range(0, h, strip_height):
+        yield y0, min(h, y0 + strip_height)
 
 
-def _connected_components(binary: np.ndarray) -> List[Tuple[int, int, int, int]]:
+def _edge_magnitude(img: np.ndarray, y0: int, y1: int) -> np.ndarray:
+    # Sobel magnitude of rows [y0, y1), equal to the same rows of the
+    # full-page computation: clamped row indices reproduce its edge padding
+    h, w = img.shape[:2]
+    gray = _to_gray(img[np.clip(np.arange(y0 - 1, y1 + 1), 0, h - 1)])
+    padded = np.pad(gray, ((0, 0), (1, 1)), mode='edge')
+    gx = _pairwise_sum(_shifted_terms(padded, SOBEL_X, (y1 - y0, w))).astype(np.float32, copy=False)
+    gy = _pairwise_sum(_shifted_terms(padded, SOBEL_Y, (y1 - y0, w))).astype(np.float32, copy=False)
+    return np.hypot(gx, gy)
+
+
+def _percentile_ranks(n: int, q: float) -> Tuple[int, int, float]:
+    # sorted-order neighbours and weight of np.percentile's 'linear' method; the index is
+    # (n - 1) * q, evaluated in numpy's operation order so the threshold stays bit-identical
+    qq = q / 100
+    virtual = n * qq + (1 - qq) - 1
+    lo = int(np.floor(virtual))
+    gamma = virtual - lo
+    return min(max(lo, 0), n - 1), min(max(lo + 1, 0), n - 1), gamma
+
+
+def _lerp(a: np.float32, b: np.float32, t: float) -> np.float32:
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+def _tiled_threshold(img: np.ndarray, strip_height: int, q: float = EDGE_PERCENTILE) -> np.float32:
+    """``np.percentile`` of the full-page edge magnitude without holding it in memory.
+
+    Magnitudes are non-negative float32, so their bit patterns sort like
+    the values: pass 1 histograms the high 16 bits, pass 2 the low 16 bits
+    inside the bins holding the two ranks needed, which gives both values
+    exactly.
+    """
+    h, w = img.shape[:2]
+    lo, hi, gamma = _percentile_ranks(h * w, q)
+    high = np.zeros(1 << 16, dtype=np.int64)
+    for y0, y1 in _strips(h, strip_height):
+        bits = _edge_magnitude(img, y0, y1).view(np.uint32)
+        high += np.bincount((bits >> 16).ravel(), minlength=1 << 16)
+    cum = np.cumsum(high)
+    bins = [int(np.searchsorted(cum, r, side='right')) for r in (lo, hi)]
+    low = {b: np.zeros(1 << 16, dtype=np.int64) for b in bins}
+    for y0, y1 in _strips(h, strip_height):
+        bits = _edge_magnitude(img, y0, y1).view(np.uint32)
+        for b, hist in low.items():
+            hist += np.bincount((bits[(bits >> 16) == b] & 0xFFFF).ravel(), minlength=1 << 16)
+    values = []
+    for r, b in zip((lo, hi), bins):
+        below = int(cum[b - 1]) if b else 0
+        lbits = int(np.searchsorted(np.cumsum(low[b]), r - below, side='right'))
+        values.append(np.array([(b << 16) | lbits], dtype=np.uint32).view(np.float32)[0])
+    return _lerp(values[0], values[1], gamma)
+
+
+def _dilate(binary: np.ndarray, iterations: int = 1, element: np.ndarray = None) -> np.ndarray:
+    return morphology.dilate(binary, element, iterations=iterations)
+
+
+def _row_runs(binary: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # horizontal runs of foreground pixels in raster order: (row, start, end)
+    h, w = binary.shape
+    framed = np.zeros((h, w + 2), dtype=np.int8)
+    framed[:, 1:-1] = binary != 0
+    d = np.diff(framed, axis=1)
+    rows, starts = np.nonzero(d == 1)
+    _, ends = np.nonzero(d == -1)
+    return rows, starts, ends
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _label_runs(binary: np.ndarray):
+    """Union-find over row runs (8-connectivity).
+
+    Returns the runs (rows, starts, ends), each run's component label and,
+    per label, the index of its first run; labels follow raster order.
+    """
+    h, w = binary.shape
+    rows, starts, ends = _row_runs(binary)
+    n = len(rows)
+    if n == 0:
+        return rows, starts, ends, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # pass 1: link every run with the runs of the previous row it touches.
+    # Keys place each row on its own stretch of a single number line, so the
+    # candidate range for all runs comes out of two searchsorted calls.
+    stride = w + 2
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    prev = rows - 1
+    lo = np.searchsorted(end_keys, prev * stride + starts, side='left')
+    hi = np.searchsorted(start_keys, prev * stride + ends, side='right')
+    hi = np.maximum(hi, lo)
+    row_first = np.searchsorted(rows, prev, side='left')
+    row_last = np.searchsorted(rows, prev, side='right')
+    lo = np.maximum(lo, row_first)
+    hi = np.minimum(hi, row_last)
+    span = np.maximum(hi - lo, 0)
+    cur = np.repeat(np.arange(n), span)
+    offs = np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span)
+    above = np.repeat(lo, span) + offs
+
+    parent = list(range(n))
+    for a, b in zip(above.tolist(), cur.tolist()):
+        ra, rb = _find(parent, a), _find(parent, b)
+        if ra != rb:
+            # the earlier run wins so labels follow raster order
+            if ra < rb:
+                parent[rb] = ra
+            else:
+                parent[ra] = rb
+
+    # pass 2: resolve roots
+    roots = np.fromiter((_find(parent, i) for i in range(n)), dtype=np.int64, count=n)
+    first, label = np.unique(roots, return_inverse=True)
+    return rows, starts, ends, label, first
+
+
+def _run_sums(rows, starts, ends, label, k: int, w: int, h: int) -> Dict[str, np.ndarray]:
+    # per-component pixel counts, coordinate sums and extents
+    lengths = ends - starts
+    counts = np.bincount(label, weights=lengths, minlength=k).astype(np.int64)
+    sum_x = np.bincount(label, weights=(starts + ends - 1) * lengths / 2.0, minlength=k)
+    sum_y = np.bincount(label, weights=rows * lengths, minlength=k)
+    minx = np.full(k, w, dtype=np.int64)
+    maxx = np.zeros(k, dtype=np.int64)
+    miny = np.full(k, h, dtype=np.int64)
+    maxy = np.zeros(k, dtype=np.int64)
+    np.minimum.at(minx, label, starts)
+    np.maximum.at(maxx, label, ends - 1)
+    np.minimum.at(miny, label, rows)
+    np.maximum.at(maxy, label, rows)
+    return {"counts": counts, "sum_x": sum_x, "sum_y": sum_y, "minx": minx, "maxx": maxx, "miny": miny, "maxy": maxy}
+
+
+def _component_stats(sums: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    minx, maxx, miny, maxy, counts = (sums[k] for k in ('minx', 'maxx', 'miny', 'maxy', 'counts'))
+    boxes = np.stack([minx, miny, maxx - minx + 1, maxy - miny + 1], axis=1).reshape(-1, 4)
+    centroids = np.stack([sums["sum_x"] / counts, sums["sum_y"] / counts], axis=1).reshape(-1, 2)
+    return {"boxes": boxes, "counts": counts, "centroids": centroids}
+
+
+def _label_components(binary: np.ndarray) -> Dict[str, np.ndarray]:
+    """Two-pass union-find labelling over row runs (8-connectivity).
+
+    Returns per-component arrays ordered like a raster scan finds them:
+    ``boxes`` (n, 4) as x, y, w, h; ``counts`` (n,) pixel counts and
+    ``centroids`` (n, 2) as cx, cy.
+    """
     h, w = binary.shape
-    visited = np.zeros((h, w), dtype=np.uint8)
-    boxes: List[Tuple[int, int, int, int]] = []
-    for y in range(h):
-        for x in range(w):
-            if binary[y, x] and not visited[y, x]:
-                # BFS
-                stack = [(y, x)]
-                visited[y, x] = 1
-                minx, miny = x, y
-                maxx, maxy = x, y
-                count = 0
-                while stack:
-                    cy, cx = stack.pop()
-                    count += 1
-                    minx, miny = min(minx, cx), min(miny, cy)
-                    maxx, maxy = max(maxx, cx), max(maxy, cy)
-                    for ny in (cy-1, cy, cy+1):
-                        for nx in (cx-1, cx, cx+1):
-                            if 0 <= ny < h and 0 <= nx < w and not visited[ny, nx] and binary[ny, nx]:
-                                visited[ny, nx] = 1
-                                stack.append((ny, nx))
-                bw = maxx - minx + 1
-                bh = maxy - miny + 1
-                boxes.append((minx, miny, bw, bh))
-    return boxes
-
-
-def find_candidate_boxes(img: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    rows, starts, ends, label, first = _label_runs(binary)
+    return _component_stats(_run_sums(rows, starts, ends, label, len(first), w, h))
+
+
+def _touching(prev_starts, prev_ends, starts, ends) -> Tuple[np.ndarray, np.ndarray]:
+    # index pairs of runs on adjacent rows that touch under 8-connectivity
+    lo = np.searchsorted(prev_ends, starts, side='left')
+    hi = np.searchsorted(prev_starts, ends, side='right')
+    span = np.maximum(hi - lo, 0)
+    cur = np.repeat(np.arange(len(starts)), span)
+    offs = np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span)
+    return np.repeat(lo, span) + offs, cur
+
+
+def _tiled_components(img: np.ndarray, element: np.ndarray, strip_height: int) -> Dict[str, np.ndarray]:
+    """``_label_components(dilate(edges))`` computed strip by strip.
+
+    Each strip is binarised and dilated with a halo of element rows so its
+    rows match the full-page result, labelled on its own, and components
+    touching across the strip boundary are merged afterwards. Only strip-sized
+    arrays and per-component sums are held at any time.
+    """
+    h, w = img.shape[:2]
+    t = _tiled_threshold(img, strip_height)
+    halo = element.shape[0] // 2
+    parent: List[int] = []
+    parts = []
+    prev = None
+    for y0, y1 in _strips(h, strip_height):
+        ya, yb = max(0, y0 - halo), min(h, y1 + halo)
+        binary = (_edge_magnitude(img, ya, yb) >= t).astype(np.uint8)
+        strip = _dilate(binary, element=element)[y0 - ya:y0 - ya + (y1 - y0)]
+        rows, starts, ends, label, first = _label_runs(strip)
+        base = len(parent)
+        parent.extend(range(base, base + len(first)))
+        sums = _run_sums(rows + y0, starts, ends, label, len(first), w, h)
+        sums["first"] = (rows[first] + y0) * (w + 2) + starts[first]
+        parts.append(sums)
+        if prev is not None and len(rows):
+            top = rows == 0
+            above, cur = _touching(prev[0], prev[1], starts[top], ends[top])
+            for a, b in zip(prev[2][above].tolist(), (label[top][cur] + base).tolist()):
+                ra, rb = _find(parent, a), _find(parent, b)
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+        bottom = rows == (y1 - y0 - 1)
+        prev = (starts[bottom], ends[bottom], label[bottom] + base)
+
+    if not parent:
+        return _component_stats({k: np.zeros(0, dtype=np.int64) for k in
+                                 ('counts', 'sum_x', 'sum_y', 'minx', 'maxx', 'miny', 'maxy')})
+    merged = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    roots = np.fromiter((_find(parent, i) for i in range(len(parent))), dtype=np.int64, count=len(parent))
+    _, label = np.unique(roots, return_inverse=True)
+    k = int(label.max()) + 1
+    out = {}
+    for key, op, init in (('minx', np.minimum, w), ('miny', np.minimum, h), ('first', np.minimum, np.iinfo(np.int64).max),
+                          ('maxx', np.maximum, 0), ('maxy', np.maximum, 0)):
+        out[key] = np.full(k, init, dtype=np.int64)
+        op.at(out[key], label, merged[key])
+    out["counts"] = np.bincount(label, weights=merged["counts"], minlength=k).astype(np.int64)
+    out["sum_x"] = np.bincount(label, weights=merged["sum_x"], minlength=k)
+    out["sum_y"] = np.bincount(label, weights=merged["sum_y"], minlength=k)
+    # raster order of each component's first run, as the full-page labelling
+    order = np.argsort(out.pop("first"), kind='stable')
+    return _component_stats({key: v[order] for key, v in out.items()})
+
+
+def _connected_components(binary: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    return [tuple(b) for b in _label_components(binary)["boxes"].tolist()]
+
+
+def _nms(boxes: List[Tuple[int, int, int, int]], iou_threshold: float = 0.9,
+         mode: str = 'greedy') -> List[Tuple[int, int, int, int]]:
+    # area-ordered NMS; see nms.py for the modes
+    return nms.suppress(boxes, iou_threshold, mode)
+
+
+def density_from_name(path: str):
+    """Export density from an ``@3x``-style file name suffix, or None."""
+    m = re.search(r'@(\d+(?:\.\d+)?)x\.\w+$', os.path.basename(path))
+    return float(m.group(1)) if m else None
+
+
+def _downsample(img: np.ndarray, k: int) -> np.ndarray:
+    # k x k block means; Pillow's reduce is several times faster than a strided NumPy mean
+    return np.asarray(Image.fromarray(np.ascontiguousarray(img)).reduce(k))
+
+
+def _band_edges(img: np.ndarray, x1: int, y1: int, x2: int, y2: int, threshold: float) -> np.ndarray:
+    # full-resolution edge mask of [y1:y2, x1:x2]; clamped indices reproduce the full-page Sobel padding
     h, w = img.shape[:2]
-    gray = _to_gray(img)
-    edges = _edges_binary(gray)
-    edges = _dilate(edges, iterations=1)
-
-    boxes = _connected_components(edges)
-
-    filtered = []
-    for (x, y, bw, bh) in boxes:
-        area = bw * bh
-        if area < 2000:
-            continue
-        if area > (w * h * 0.6):
-            continue
-        ratio = bw / float(bh)
-        if ratio < 0.2 or ratio > 5.0:
-            continue
-        filtered.append((x, y, bw, bh))
-
-    # sort by area descending then apply crude NMS
-    filtered.sort(key=lambda b: b[2] * b[3], reverse=True)
-    selected: List[Tuple[int, int, int, int]] = []
-    def iou(a, b):
-        ax1, ay1, aw, ah = a
-        bx1, by1, bw, bh = b
-        ax2, ay2 = ax1 + aw, ay1 + ah
-        bx2, by2 = bx1 + bw, by1 + bh
-        inter_x1 = max(ax1, bx1)
-        inter_y1 = max(ay1, by1)
-        inter_x2 = min(ax2, bx2)
-        inter_y2 = min(ay2, by2)
-        inter_w = max(0, inter_x2 - inter_x1)
-        inter_h = max(0, inter_y2 - inter_y1)
-        inter_area = inter_w * inter_h
-        a_area = aw * ah
-        b_area = bw * bh
-        union = a_area + b_area - inter_area
-        return inter_area / union if union > 0 else 0.0
-    for b in filtered:
-        if all(iou(b, sb) <= 0.9 for sb in selected):
-            selected.append(b)
-
-    mediums = [b for b in selected if 5000 <= b[2] * b[3] <= 150000]
-    smalls = [b for b in selected if 2000 <= b[2] * b[3] < 5000]
-    larges = [b for b in selected if b[2] * b[3] > 150000]
+    rows = np.clip(np.arange(y1 - 1, y2 + 1), 0, h - 1)
+    cols = np.clip(np.arange(x1 - 1, x2 + 1), 0, w - 1)
+    mag = _sobel_magnitude(_to_gray(img[rows[:, None], cols]))
+    return mag[1:-1, 1:-1] >= threshold
+
+
+def _first_last(hits: np.ndarray):
+    idx = np.flatnonzero(hits)
+    return (int(idx[0]), int(idx[-1])) if len(idx) else (None, None)
+
+
+def _refine_scaled(img: np.ndarray, boxes, k: int, threshold: float,
+                   radius: Tuple[int, int]) -> List[Tuple[int, int, int, int]]:
+    """Scale level boxes up by ``k`` and snap each side to the full-resolution edges near it.
+
+    A level box spans its edges plus the dilation ``radius`` (rows, cols) in
+    level px, give or take one level px of blur, so each side is searched in a
+    band of that width; the found edge is then grown by ``radius`` full px, as
+    full-resolution detection would report it. Sides without edges keep the
+    scaled position.
+    """
+    h, w = img.shape[:2]
+    ry, rx = radius
+    out = []
+    for x, y, bw, bh in boxes:
+        X1, Y1, X2, Y2 = x * k, y * k, min(w, (x + bw) * k), min(h, (y + bh) * k)
+        bx, by = (rx + 1) * k, (ry + 1) * k
+        a, b = max(0, X1 - k), min(w, X1 + bx)
+        first, _ = _first_last(_band_edges(img, a, Y1, b, Y2, threshold).any(axis=0))
+        nx1 = X1 if first is None else max(0, a + first - rx)
+        a, b = max(0, X2 - bx), min(w, X2 + k)
+        _, last = _first_last(_band_edges(img, a, Y1, b, Y2, threshold).any(axis=0))
+        nx2 = X2 if last is None else min(w, a + last + 1 + rx)
+        a, b = max(0, Y1 - k), min(h, Y1 + by)
+        first, _ = _first_last(_band_edges(img, nx1, a, nx2, b, threshold).any(axis=1))
+        ny1 = Y1 if first is None else max(0, a + first - ry)
+        a, b = max(0, Y2 - by), min(h, Y2 + k)
+        _, last = _first_last(_band_edges(img, nx1, a, nx2, b, threshold).any(axis=1))
+        ny2 = Y2 if last is None else min(h, a + last + 1 + ry)
+        out.append((nx1, ny1, nx2 - nx1, ny2 - ny1))
+    return out
+
+
+def _pyramid_boxes(img: np.ndarray, density: float, element: np.ndarray, **options) -> List[Tuple[int, int, int, int]]:
+    # detect on a level near LEVEL_DENSITY, then refine the selected boxes at full resolution
+    k = int(density // LEVEL_DENSITY)
+    h, w = img.shape[:2]
+    with slice_trace.span('pyramid_level', pixels=h * w, factor=k):
+        level = _downsample(img, k)
+        mag = _sobel_magnitude(_to_gray(level))
+        t = np.percentile(mag, EDGE_PERCENTILE)
+        edges = (mag >= t).astype(np.uint8)
+    boxes = find_candidate_boxes(level, edges=edges, density=density / k, **options)
+    with slice_trace.span('pyramid_refine', boxes=len(boxes), factor=k):
+        refined = _refine_scaled(img, boxes, k, float(t), (element.shape[0] // 2, element.shape[1] // 2))
+    refined.sort(key=lambda b: (b[1], b[0]))
+    return refined
+
+
+def component_stats(img: np.ndarray, element_size=3, element_shape: str = 'rect', strip_height: int = None,
+                    edges: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """``_label_components`` of the dilated edge map: the part of detection that touches every pixel."""
+    h, w = img.shape[:2]
+    # element_size (int or (h, w)) sets how wide a gap between edges gets bridged
+    element = morphology.structuring_element(element_size, element_shape)
+    if strip_height and strip_height < h:
+        # tiled mode for tall pages: same components, memory bounded by the strip
+        with slice_trace.span('tiled_components', pixels=h * w, strip_height=strip_height):
+            return _tiled_components(img, element, strip_height)
+    if edges is None:
+        with slice_trace.span('gray', pixels=h * w) as sp:
+            gray = _to_gray(img)
+            sp.set(bytes=gray.nbytes)
+        with slice_trace.span('edges', pixels=h * w, bytes=gray.nbytes * 12):
+            edges = _edges_binary(gray)
+    with slice_trace.span('dilate', pixels=h * w, element=list(element.shape)):
+        edges = _dilate(edges, element=element)
+    with slice_trace.span('label', pixels=h * w):
+        return _label_components(edges)
+
+
+def find_candidate_boxes(img: np.ndarray, min_fill: float = 0.0, element_size=3,
+                         element_shape: str = 'rect', strip_height: int = None,
+                         nms_mode: str = 'greedy', edges: np.ndarray = None,
+                         density: float = None, pyramid: bool = False,
+                         components: Dict[str, np.ndarray] = None) -> List[Tuple[int, int, int, int]]:
+    # ``edges``: precomputed _edges_binary(_to_gray(img)), e.g. from the daemon's cache
+    # ``components``: precomputed component_stats(img, element_size, element_shape), likewise
+    # ``density``: export scale of ``img`` (default REFERENCE_DENSITY); area limits follow it
+    # ``pyramid``: detect on a level downsampled to ~LEVEL_DENSITY, refine box edges at full resolution
+    h, w = img.shape[:2]
+    density = density or REFERENCE_DENSITY
+    if pyramid and density >= 2 * LEVEL_DENSITY:
+        element = morphology.structuring_element(element_size, element_shape)
+        return _pyramid_boxes(img, density, element, min_fill=min_fill, element_size=element_size,
+                              element_shape=element_shape, nms_mode=nms_mode)
+    scale = (density / REFERENCE_DENSITY) ** 2
+    min_area, medium_area, large_area = MIN_AREA * scale, MEDIUM_AREA * scale, LARGE_AREA * scale
+    stats = components
+    if stats is None:
+        stats = component_stats(img, element_size, element_shape, strip_height, edges)
+    boxes = stats["boxes"]
+    bw, bh = boxes[:, 2], boxes[:, 3]
+    area = bw * bh
+    ratio = bw / bh.astype(np.float64)
+    # fill ratio: share of the box actually covered by the component
+    fill = stats["counts"] / area.astype(np.float64)
+    keep = (
+        (area >= min_area)
+        & (area <= w * h * 0.6)
+        & (ratio >= 0.2) & (ratio <= 5.0)
+        & (fill >= min_fill)
+    )
+    filtered = [tuple(b) for b in boxes[keep].tolist()]
+
+    with slice_trace.span('nms', boxes=len(filtered)):
+        selected = _nms(filtered, mode=nms_mode)
+
+    mediums = [b for b in selected if medium_area <= b[2] * b[3] <= large_area]
+    smalls = [b for b in selected if min_area <= b[2] * b[3] < medium_area]
+    larges = [b for b in selected if b[2] * b[3] > large_area]
     final = mediums + smalls + larges[:3]
     final.sort(key=lambda b: (b[1], b[0]))
+    slice_trace.count('boxes', components=len(boxes), candidates=len(filtered), selected=len(final))
     return final
 
 
-def save_slices(img: np.ndarray, boxes: List[Tuple[int, int, int, int]], out_dir: str) -> List[dict]:
+def save_slices(img: np.ndarray, boxes: List[Tuple[int, int, int, int]], out_dir: str,
+                encode: dict = None, processes: int = None) -> List[dict]:
     ensure_dir(out_dir)
     meta = []
-    pil_img = Image.fromarray(img)
+    items = []
     for i, (x, y, w, h) in enumerate(boxes, start=1):
         pad = 6
         x1 = max(0, x - pad)
         y1 = max(0, y - pad)
         x2 = min(img.shape[1], x + w + pad)
         y2 = min(img.shape[0], y + h + pad)
-        crop = pil_img.crop((x1, y1, x2, y2))
         name = f"slice_{i:03d}.png"
-        crop.save(os.path.join(out_dir, name))
+        items.append((name, (x1, y1, x2, y2), encode))
         meta.append({"name": name, "bbox": [int(x1), int(y1), int(x2 - x1), int(y2 - y1)]})
+    # encode in parallel from views into ``img`` (or its shared-memory copy); the file
+    # name follows the format the encoder picked
+    if processes and processes > 1 and len(items) > 1:
+        import shm_export
+        with shm_export.SharedImage(img) as shared:
+            results = shm_export.encode_regions(shared, items, processes)
+    else:
+        results = encoders.encode_many((name, img[y1:y2, x1:x2], spec) for name, (x1, y1, x2, y2), spec in items)
+    with slice_trace.span('write', files=len(results), bytes=sum(r["after"] for r in results)):
+        for m, r in zip(meta, results):
+            with open(os.path.join(out_dir, r["name"]), 'wb') as f:
+                f.write(r["data"])
+            m["name"] = r["name"]
     return meta
 
 
@@ -170,25 +510,56 @@ def save_preview(img: np.ndarray, boxes: List[Tuple[int, int, int, int]], out_pa
     pil_prev.save(out_path)
 
 
+def slice_page(in_path: str, out_dir: str, encode: dict = None, processes: int = None, **options) -> List[dict]:
+    with slice_trace.span('decode', path=in_path) as sp:
+        img = np.array(Image.open(in_path).convert('RGB'))
+        sp.set(pixels=img.shape[0] * img.shape[1], bytes=img.nbytes)
+
+    options.setdefault('density', density_from_name(in_path))
+    boxes = find_candidate_boxes(img, **options)
+    meta = save_slices(img, boxes, out_dir, encode, processes)
+    ensure_dir(out_dir)
+    with slice_trace.span('write_json'):
+        with open(os.path.join(out_dir, 'slices.json'), 'w', encoding='utf-8') as f:
+            json.dump({"input": in_path, "count": len(meta), "slices": meta}, f, ensure_ascii=False, indent=2)
+    with slice_trace.span('preview'):
+        save_preview(img, boxes, os.path.join(out_dir, 'preview_bboxes.png'))
+    return meta
+
+
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 scripts/slice_login.py <input_png> <output_dir>")
+    args = sys.argv[1:]
+    options = {}
+    if '--strip-height' in args:
+        # tiled mode for long-scroll pages: --strip-height <rows>
+        i = args.index('--strip-height')
+        options["strip_height"] = int(args[i + 1])
+        del args[i:i + 2]
+    if '--processes' in args:
+        # encode slices in N worker processes sharing one copy of the decoded page
+        i = args.index('--processes')
+        options["processes"] = int(args[i + 1])
+        del args[i:i + 2]
+    if '--density' in args:
+        # export scale of the input when its name has no @Nx suffix (default 2)
+        i = args.index('--density')
+        options["density"] = float(args[i + 1])
+        del args[i:i + 2]
+    if '--pyramid' in args:
+        # detect on a downsampled level, refine box edges at full resolution
+        options["pyramid"] = True
+        args.remove('--pyramid')
+    if len(args) < 2:
+        print("Usage: python3 scripts/slice_login.py <input_png> <output_dir> [--strip-height N] [--processes N] "
+              "[--density D] [--pyramid]")
         sys.exit(1)
-    in_path = sys.argv[1]
-    out_dir = sys.argv[2]
+    in_path = args[0]
+    out_dir = args[1]
     if not os.path.exists(in_path):
         print(f"Input not found: {in_path}")
         sys.exit(2)
 
-    pil = Image.open(in_path).convert('RGB')
-    img = np.array(pil)
-
-    boxes = find_candidate_boxes(img)
-    meta = save_slices(img, boxes, out_dir)
-    ensure_dir(out_dir)
-    with open(os.path.join(out_dir, 'slices.json'), 'w', encoding='utf-8') as f:
-        json.dump({"input": in_path, "count": len(meta), "slices": meta}, f, ensure_ascii=False, indent=2)
-    save_preview(img, boxes, os.path.join(out_dir, 'preview_bboxes.png'))
+    meta = slice_page(in_path, out_dir, **options)
     print(f"Done. Slices: {len(meta)} -> {out_dir}")
 
 
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Declarative slicing pipeline.
+
+Runs the per-variant slice scripts as stages of one pass driven by
+``pipeline_config.json``: every source image is opened once (and decoded
+only if some output is stale), crops/re-slices/overlay go through the shared
+build cache, and the JSON/WXML/WXSS outputs are collected and written
+together at the end.
+
+Usage: python3 scripts/slice_pipeline.py [config.json] [--only crop,wxml]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import build_cache
+import dedup_slices
+import slice_trace
+import slice_custom7_login
+import slice_custom_login
+import slice_interactive_login
+import wxml_codegen
+from atlas import build_atlas
+from generate_alignment_overlay import draw_overlay
+from slice_assets import canvas_config_js, encode_spec, export_crops, export_design
+
+DEFAULT_CONFIG = os.path.join('scripts', 'pipeline_config.json')
+
+STAGES = {}
+
+
+def stage(name):
+    def register(fn):
+        STAGES[name] = fn
+        return fn
+    return register
+
+
+class PipelineContext:
+    def __init__(self, cfg: dict):
+        self.cfg = cfg
+        self.source_paths = cfg.get('sources', {})
+        self.out_dir = cfg['out_dir']
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.cache = build_cache.BuildCache(self.out_dir)
+        # encoder specs: {"default": spec, "assets": {name: spec}}, see encoders.py
+        self.encode = cfg.get('encode')
+        self.workers = cfg.get('workers')
+        # encode in this many processes from a shared-memory copy of the design (shm_export.py)
+        self.processes = cfg.get('processes')
+        self.sources = {}
+        # variant -> (slice metadata, variant config, source, atlas or None)
+        self.results = {}
+        # variant -> (manifest path, renderer), re-rendered when a later stage edits the metadata
+        self.manifests = {}
+        # path -> text, flushed together once every stage has run
+        self.pending = {}
+
+    def source(self, name: str) -> build_cache.LazySource:
+        if name not in self.sources:
+            path = self.source_paths.get(name, name)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f'Input not found: {path}')
+            self.sources[name] = build_cache.LazySource(path)
+        return self.sources[name]
+
+    def forget(self, paths):
+        # drop sources whose file changed so the next use re-hashes and re-decodes
+        for name in [n for n, s in self.sources.items() if s.path in paths]:
+            del self.sources[name]
+
+    def emit(self, path: str, text: str):
+        self.pending[path] = text
+
+    def current(self, path: str) -> str:
+        # text as emitted earlier in this run, else as on disk
+        return self.pending[path] if path in self.pending else wxml_codegen.read(path)
+
+    def flush(self) -> int:
+        with slice_trace.span('flush', files=len(self.pending)):
+            self.cache.save()
+            return sum(build_cache.write_text_if_changed(p, t) for p, t in self.pending.items())
+
+
+@stage('crop')
+def crop_stage(ctx: PipelineContext, spec: dict):
+    src = ctx.source(spec['source'])
+    W, H = src.size
+    variant = spec.get('variant')
+    atlas = None
+    if spec.get('atlas') and variant != 'interactive':
+        raise ValueError(f'atlas mode is only supported for the interactive variant, not {variant!r}')
+    if variant == 'interactive':
+        vcfg = slice_interactive_login.load_config(spec.get('config', slice_interactive_login.CFG_PATH))
+        plan = slice_interactive_login.slice_plan(vcfg)
+        if spec.get('atlas'):
+            # {"name": ..., "padding": ...}; true for the defaults
+            acfg = spec['atlas'] if isinstance(spec['atlas'], dict) else {}
+            meta, atlas = build_atlas(src, ctx.cache, plan, acfg.get('name', slice_interactive_login.ATLAS_NAME),
+                                      acfg.get('padding', 2), ctx.encode)
+        else:
+            meta = export_crops(src, ctx.cache, plan, ctx.encode, ctx.workers, processes=ctx.processes)
+        render = lambda: slice_interactive_login.slices_json(meta, vcfg, W, H, src.path, atlas)
+    elif variant == 'custom7':
+        vcfg = None
+        meta = export_crops(src, ctx.cache, slice_custom7_login.load_slices(W, spec.get('config', slice_custom7_login.CFG_PATH)), ctx.encode, ctx.workers, processes=ctx.processes)
+        render = lambda: slice_custom7_login.slices_json(meta, W, H, src.path)
+    elif variant == 'custom':
+        vcfg = None
+        meta = export_crops(src, ctx.cache, spec.get('slices', slice_custom_login.SLICES), ctx.encode, ctx.workers, processes=ctx.processes)
+        render = lambda: slice_custom_login.slices_json(meta, src.path)
+    else:
+        vcfg = None
+        meta = export_crops(src, ctx.cache, spec['slices'], ctx.encode, ctx.workers, processes=ctx.processes)
+        render = lambda: json.dumps({"input": src.path, "canvas_size": [W, H], "count": len(meta), "slices": meta},
+                                    ensure_ascii=False, indent=2)
+    key = variant or spec.get('manifest')
+    if spec.get('manifest'):
+        path = os.path.join(ctx.out_dir, spec['manifest'])
+        ctx.manifests[key] = (path, render)
+        ctx.emit(path, render())
+    ctx.results[key] = (meta, vcfg, src, atlas)
+
+
+@stage('dedup')
+def dedup_stage(ctx: PipelineContext, spec: dict):
+    # across every variant cropped so far; folded slices get "src" in their metadata.
+    # Exact matches only by default: near matches among crops of one design are mostly
+    # neighbouring boxes a pixel apart, which would shift on the page.
+    dedup_slices.fold([meta for meta, _, _, _ in ctx.results.values()], ctx.cache,
+                      spec.get('max_distance', dedup_slices.MAX_DISTANCE), spec.get('tolerance', 0.0))
+    for path, render in ctx.manifests.values():
+        ctx.emit(path, render())
+
+
+@stage('reslice')
+def reslice_stage(ctx: PipelineContext, spec: dict):
+    export_crops(ctx.source(spec['source']), ctx.cache, spec['slices'], ctx.encode, ctx.workers, processes=ctx.processes)
+
+
+@stage('design')
+def design_stage(ctx: PipelineContext, spec: dict):
+    src = ctx.source(spec['source'])
+    export_design(src, ctx.cache, spec.get('name', 'design.png'), ctx.encode)
+    if spec.get('canvas_config'):
+        ctx.emit(spec['canvas_config'], canvas_config_js(*src.size))
+
+
+@stage('overlay')
+def overlay_stage(ctx: PipelineContext, spec: dict):
+    src = ctx.source(spec['source'])
+    with open(spec['config'], 'r', encoding='utf-8') as f:
+        ocfg = json.load(f)
+    name = spec.get('name', 'audit.png')
+    espec = encode_spec(ctx.encode, name)
+    key = src.output_key(overlay=build_cache.config_hash({k: ocfg.get(k) for k in ('bboxes', 'inputs')}), encode=espec)
+    if not ctx.cache.is_fresh(name, key):
+        ctx.cache.save_image(name, key, draw_overlay(src.image, ocfg), espec)
+
+
+@stage('wxml')
+def wxml_stage(ctx: PipelineContext, spec: dict):
+    variant = spec['variant']
+    if variant not in ctx.results:
+        raise ValueError(f'wxml stage needs a crop stage for variant {variant!r} first')
+    meta, vcfg, src, atlas = ctx.results[variant]
+    W, H = src.size
+    if variant == 'interactive':
+        body, module = slice_interactive_login.render_wxml(meta, vcfg, W, H, atlas), slice_interactive_login
+    elif variant == 'custom7':
+        body, module = slice_custom7_login.render_wxml(meta, W, H), slice_custom7_login
+    elif variant == 'custom':
+        body, module = slice_custom_login.render_wxml(meta), slice_custom_login
+    else:
+        raise ValueError(f'no WXML renderer for variant {variant!r}')
+    # only the generated region changes; the rest of the page is kept as edited
+    # ("init": true adopts a page that has no markers yet)
+    ctx.emit(spec['wxml'], wxml_codegen.update_wxml(ctx.current(spec['wxml']), body, init=bool(spec.get('init')),
+                                                    **module.CANVAS))
+    if spec.get('wxss') and variant == 'interactive':
+        path = spec['wxss']
+        ctx.emit(path, slice_interactive_login.render_wxss(ctx.current(path)))
+
+
+VARIANT_CONFIGS = {
+    'interactive': slice_interactive_login.CFG_PATH,
+    'custom7': slice_custom7_login.CFG_PATH,
+}
+
+
+def stage_inputs(cfg: dict, spec: dict) -> set:
+    """Files a stage reads: its source image and its config file, if any."""
+    paths = set()
+    if 'source' in spec:
+        paths.add(cfg.get('sources', {}).get(spec['source'], spec['source']))
+    config = spec.get('config')
+    if config is None and spec['type'] == 'crop':
+        config = VARIANT_CONFIGS.get(spec.get('variant'))
+    if config:
+        paths.add(config)
+    return paths
+
+
+def affected_stages(cfg: dict, changed) -> list:
+    """Stages reading any of ``changed``, plus the dedup and wxml stages of re-cropped variants."""
+    stages = cfg.get('stages', [])
+    hit = [bool(stage_inputs(cfg, s) & set(changed)) for s in stages]
+    variants = {s.get('variant') for s, h in zip(stages, hit) if h and s['type'] == 'crop'}
+    return [s for s, h in zip(stages, hit)
+            if h or (s['type'] == 'wxml' and s['variant'] in variants) or (s['type'] == 'dedup' and variants)]
+
+
+def load_pipeline(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_stages(ctx: PipelineContext, specs, only=None):
+    for spec in specs:
+        kind = spec['type']
+        if only and kind not in only:
+            continue
+        if kind not in STAGES:
+            raise ValueError(f'unknown pipeline stage: {kind!r}')
+        with slice_trace.span(f'stage:{kind}', variant=spec.get('variant')):
+            STAGES[kind](ctx, spec)
+
+
+def run_pipeline(cfg: dict, only=None) -> PipelineContext:
+    ctx = PipelineContext(cfg)
+    run_stages(ctx, cfg.get('stages', []), only)
+    return ctx
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the declarative slicing pipeline.')
+    parser.add_argument('config', nargs='?', default=DEFAULT_CONFIG)
+    parser.add_argument('--only', default='', help='comma-separated stage types to run (default: all)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.config):
+        print(f'Config not found: {args.config}')
+        sys.exit(2)
+    only = {s.strip() for s in args.only.split(',') if s.strip()}
+    t0 = time.perf_counter()
+    ctx = run_pipeline(load_pipeline(args.config), only)
+    files = ctx.flush()
+    decodes = sum(1 for s in ctx.sources.values() if s.decoded)
+    print(f'Pipeline done in {time.perf_counter() - t0:.2f}s: '
+          f'{len(ctx.sources)} source(s), {decodes} decode(s); assets: {ctx.cache.summary()}; '
+          f'{files}/{len(ctx.pending)} text file(s) changed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Lightweight per-stage instrumentation for the slice scripts.
+
+Tracing is off unless ``SLICE_TRACE`` is set (or ``enable()`` is called).
+While off, ``span`` returns a shared no-op context manager and ``count`` /
+``traced`` reduce to one flag check, so the instrumented code pays nearly
+nothing.
+
+    with slice_trace.span('dilate', pixels=img.size):
+        ...
+    slice_trace.count('boxes', candidates=len(c), selected=len(s))
+
+``SLICE_TRACE=trace.json`` makes every script write a Chrome trace-event
+file (load it in chrome://tracing or Perfetto) and print a one-line summary
+on exit; ``SLICE_TRACE=1`` prints only the summary. ``SLICE_TRACE_MEM=1``
+also records each span's tracemalloc peak.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+import tracemalloc
+from collections import OrderedDict
+from typing import Optional
+
+_enabled = False
+_memory = False
+_events = []
+_lock = threading.Lock()
+_t0 = time.perf_counter()
+_owner = os.getpid()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start', 'mem0')
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+    def set(self, **args):
+        # attach values only known once the stage ran (box counts, bytes written)
+        self.args.update(args)
+
+    def __enter__(self):
+        if _memory:
+            tracemalloc.reset_peak()
+            self.mem0 = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        if _memory:
+            self.args['alloc_peak'] = tracemalloc.get_traced_memory()[1] - self.mem0
+        _record({"name": self.name, "ph": "X", "ts": _us(self.start), "dur": _us(end) - _us(self.start),
+                 "args": self.args})
+        return False
+
+
+def _us(t: float) -> float:
+    return round((t - _t0) * 1e6, 1)
+
+
+def _record(event: dict):
+    event["pid"] = os.getpid()
+    event["tid"] = threading.get_ident()
+    with _lock:
+        _events.append(event)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(memory: bool = False):
+    global _enabled, _memory
+    _enabled = True
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _enabled, _memory
+    _enabled = False
+    _memory = False
+
+
+def reset():
+    with _lock:
+        _events.clear()
+
+
+def span(name: str, **args):
+    """Context manager timing one stage; ``args`` (pixels, bytes, ...) go into the trace."""
+    if not _enabled:
+        return _NULL
+    return _Span(name, args)
+
+
+def count(name: str, **values):
+    """Record counter values (e.g. candidate/selected box counts)."""
+    if _enabled:
+        _record({"name": name, "ph": "C", "ts": _us(time.perf_counter()), "args": values})
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of ``span``."""
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*a, **kw):
+            if not _enabled:
+                return fn(*a, **kw)
+            with _Span(label, {}):
+                return fn(*a, **kw)
+        return inner
+    return wrap
+
+
+def chrome_trace() -> dict:
+    with _lock:
+        events = list(_events)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome(path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(), f, ensure_ascii=False)
+
+
+def summary() -> str:
+    """One line: total time per stage (in first-seen order) and the last counter values."""
+    totals = OrderedDict()
+    counters = OrderedDict()
+    with _lock:
+        events = list(_events)
+    for e in events:
+        if e["ph"] == "X":
+            totals[e["name"]] = totals.get(e["name"], 0.0) + e["dur"]
+        else:
+            counters.setdefault(e["name"], {}).update(e["args"])
+    parts = [f'{k} {v / 1000:.1f}ms' for k, v in totals.items()]
+    parts += [f'{k} ' + ','.join(f'{n}={v}' for n, v in vals.items()) for k, vals in counters.items()]
+    return 'trace: ' + (' | '.join(parts) if parts else 'no events')
+
+
+def _export_at_exit(path: str):
+    # pool workers inherit the hook on fork; only the process that set it up writes
+    if not _events or os.getpid() != _owner:
+        return
+    export_chrome(path)
+    print(f'{summary()} -> {path}', file=sys.stderr)
+
+
+_env_path = os.environ.get('SLICE_TRACE')
+if _env_path:
+    enable(memory=os.environ.get('SLICE_TRACE_MEM') == '1')
+    if _env_path in ('1', 'true'):
+        atexit.register(lambda: _events and print(summary(), file=sys.stderr))
+    else:
+        atexit.register(_export_at_exit, _env_path)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Locate design layers in the flattened page with FFT normalized cross-correlation.
+
+The designer's layer exports (``*@2x.png`` in ``UIDESIGN/登录页.zip``, read
+without unpacking, or an unpacked directory of them) are pieces of
+``登录页.png`` (itself a @2x export), so their positions give the bboxes
+``interactive_config.json`` needs without hand-tuned offsets.
+
+Layers with texture (icons, illustrations) are flattened onto white and
+matched on grey levels. Flat single-colour layers (rounded rectangles) carry
+their information in the outline only and are often covered by text, so
+they are matched as shapes: the page is keyed to the layer's colour and
+correlated with the layer's alpha. Either way the score is zero-mean NCC,
+computed with one FFT correlation plus summed-area tables for the window
+statistics.
+
+Search runs coarse-to-fine: a full-page search on a downsampled pyramid
+level, then a +/-REFINE_RADIUS window on each finer level.
+
+Usage: python3 scripts/template_align.py [--write]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import zipfile
+from typing import Dict, List, Mapping, Tuple
+
+import numpy as np
+from PIL import Image
+
+import design_zip
+import slice_trace
+
+IN_IMG = os.path.join('UIDESIGN', '登录页.png')
+# the designer's zip (see design_zip.py) or a directory it was unpacked into
+LAYERS_DIR = os.path.join('UIDESIGN', '登录页.zip')
+CFG_PATH = os.path.join('scripts', 'interactive_config.json')
+DENSITY = '@2x'
+
+# config key -> layer name (without density suffix). Copies of one shape are
+# ranked top-to-bottom and ``occurrence`` picks among them.
+DEFAULT_LAYERS = {
+    "username_bg": {"layer": "圆角矩形 7", "occurrence": 0, "of": 2},
+    "password_bg": {"layer": "圆角矩形 7 拷贝", "occurrence": 1, "of": 2},
+    "login_button_bg": {"layer": "圆角矩形 7 拷贝 3"},
+    "privacy_checkbox": {"layer": "椭圆 2"},
+}
+# input boxes sit inside their backgrounds with this inset (x, y, -w, -h)
+INPUT_INSET = {"username": ("username_bg", [10, 8, -20, -16]), "password": ("password_bg", [10, 8, -20, -16])}
+
+MIN_COARSE_SIDE = 12
+REFINE_RADIUS = 2
+FLAT_STD = 4.0
+KEY_TOLERANCE = 8
+
+
+def _flatten(layer: Image.Image) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rgba = np.asarray(layer.convert('RGBA'), dtype=np.float64)
+    alpha = rgba[:, :, 3] / 255.0
+    rgb = rgba[:, :, :3] * alpha[:, :, None] + 255.0 * (1.0 - alpha[:, :, None])
+    gray = 0.299 * rgb[:, :, 0] + 0.587 * rgb[:, :, 1] + 0.114 * rgb[:, :, 2]
+    return rgba, alpha, gray
+
+
+def _page_gray(rgb: np.ndarray) -> np.ndarray:
+    rgb = rgb.astype(np.float64)
+    return 0.299 * rgb[:, :, 0] + 0.587 * rgb[:, :, 1] + 0.114 * rgb[:, :, 2]
+
+
+def _downsample(a: np.ndarray) -> np.ndarray:
+    h, w = a.shape[0] // 2 * 2, a.shape[1] // 2 * 2
+    a = a[:h, :w]
+    return 0.25 * (a[0::2, 0::2] + a[1::2, 0::2] + a[0::2, 1::2] + a[1::2, 1::2])
+
+
+def build_pyramid(a: np.ndarray, levels: int) -> List[np.ndarray]:
+    pyr = [a]
+    for _ in range(levels):
+        if min(pyr[-1].shape) < 2:
+            break
+        pyr.append(_downsample(pyr[-1]))
+    return pyr
+
+
+def _window_sums(a: np.ndarray, th: int, tw: int) -> np.ndarray:
+    # sum of every th x tw window (valid mode) from a summed-area table
+    sat = np.zeros((a.shape[0] + 1, a.shape[1] + 1))
+    sat[1:, 1:] = a.cumsum(0).cumsum(1)
+    return sat[th:, tw:] - sat[:-th, tw:] - sat[th:, :-tw] + sat[:-th, :-tw]
+
+
+def ncc_map(image: np.ndarray, template: np.ndarray) -> np.ndarray:
+    """Zero-mean NCC of ``template`` at every placement fully inside ``image``."""
+    ih, iw = image.shape
+    th, tw = template.shape
+    if th > ih or tw > iw:
+        return np.full((0, 0), -1.0)
+    n = th * tw
+    t = template - template.mean()
+    t_norm = np.sqrt((t * t).sum())
+    shape = (ih + th - 1, iw + tw - 1)
+    # correlation = convolution with the flipped template
+    full = np.fft.irfft2(np.fft.rfft2(image, s=shape) * np.fft.rfft2(t[::-1, ::-1], s=shape), s=shape)
+    num = full[th - 1:ih, tw - 1:iw]
+    s = _window_sums(image, th, tw)
+    ss = _window_sums(image * image, th, tw)
+    i_norm = np.sqrt(np.maximum(ss - s * s / n, 0.0))
+    den = i_norm * t_norm
+    return np.where(den > 1e-9, num / np.maximum(den, 1e-12), 0.0)
+
+
+def _ncc_at(image: np.ndarray, template: np.ndarray, x: int, y: int) -> float:
+    th, tw = template.shape
+    win = image[y:y + th, x:x + tw]
+    if win.shape != template.shape:
+        return -1.0
+    a = win - win.mean()
+    t = template - template.mean()
+    den = np.sqrt((a * a).sum() * (t * t).sum())
+    return float((a * t).sum() / den) if den > 1e-9 else 0.0
+
+
+def _peaks(score: np.ndarray, k: int, suppress: Tuple[int, int]) -> List[Tuple[int, int, float]]:
+    # greedy top-k with a template-sized exclusion zone around each pick
+    s = score.copy()
+    out = []
+    sh, sw = suppress
+    for _ in range(k):
+        if s.size == 0:
+            break
+        y, x = np.unravel_index(int(np.argmax(s)), s.shape)
+        val = float(s[y, x])
+        if val <= -1.0:
+            break
+        out.append((int(x), int(y), val))
+        s[max(0, y - sh):y + sh + 1, max(0, x - sw):x + sw + 1] = -1.0
+    return out
+
+
+def match_template(page: List[np.ndarray], template: np.ndarray, count: int = 1) -> List[Tuple[int, int, float]]:
+    """Best ``count`` non-overlapping placements (x, y, score) of ``template`` in ``page[0]``.
+
+    ``page`` is the page pyramid from ``build_pyramid``.
+    """
+    th, tw = template.shape
+    level = 0
+    while level + 1 < len(page) and min(th, tw) >> (level + 1) >= MIN_COARSE_SIDE:
+        level += 1
+    t_pyr = build_pyramid(template, level)
+
+    coarse = ncc_map(page[level], t_pyr[level])
+    ch, cw = t_pyr[level].shape
+    candidates = _peaks(coarse, count, (max(1, ch // 2), max(1, cw // 2)))
+
+    results = []
+    for x, y, score in candidates:
+        for lv in range(level - 1, -1, -1):
+            cx, cy = 2 * x, 2 * y
+            best = (-2.0, cx, cy)
+            for dy in range(-REFINE_RADIUS, REFINE_RADIUS + 1):
+                for dx in range(-REFINE_RADIUS, REFINE_RADIUS + 1):
+                    px, py = cx + dx, cy + dy
+                    if px < 0 or py < 0:
+                        continue
+                    v = _ncc_at(page[lv], t_pyr[lv], px, py)
+                    if v > best[0]:
+                        best = (v, px, py)
+            score, x, y = best
+        results.append((x, y, score))
+    return results
+
+
+class PageMatcher:
+    """Page pyramids (grey and per-colour keys), built once and reused for every layer."""
+
+    def __init__(self, page_img: Image.Image, levels: int = 6):
+        self.rgb = np.asarray(page_img.convert('RGB')).astype(np.int16)
+        self.levels = levels
+        self.gray = build_pyramid(_page_gray(self.rgb), levels)
+        self._keys = {}
+
+    def keyed(self, colour: Tuple[int, int, int]) -> List[np.ndarray]:
+        if colour not in self._keys:
+            diff = np.abs(self.rgb - np.array(colour, dtype=np.int16)).max(axis=2)
+            self._keys[colour] = build_pyramid((diff <= KEY_TOLERANCE).astype(np.float64), self.levels)
+        return self._keys[colour]
+
+    def match(self, layer: Image.Image, count: int = 1) -> List[Tuple[int, int, float]]:
+        rgba, alpha, gray = _flatten(layer)
+        opaque = alpha >= 0.99
+        if opaque.any() and gray[opaque].std() < FLAT_STD:
+            colour = tuple(int(v) for v in np.median(rgba[:, :, :3][opaque], axis=0))
+            return match_template(self.keyed(colour), alpha, count)
+        return match_template(self.gray, gray, count)
+
+
+def load_layers(layers_dir: str = LAYERS_DIR, density: str = DENSITY) -> Mapping[str, Image.Image]:
+    if zipfile.is_zipfile(layers_dir):
+        # decompressed on first access, so only the layers the spec names are read
+        return design_zip.DesignArchive(layers_dir).layers(density)
+    layers = {}
+    for path in sorted(glob.glob(os.path.join(layers_dir, f'*{density}.png'))):
+        name = os.path.basename(path)[:-len(f'{density}.png')]
+        layers[name] = Image.open(path)
+    return layers
+
+
+def align_layers(page_img: Image.Image, layers: Mapping[str, Image.Image], spec: Dict[str, dict] = None,
+                 min_score: float = 0.5, matcher: PageMatcher = None,
+                 found: dict = None) -> Dict[str, List[int]]:
+    """Resolve ``spec`` (config key -> {"layer", "occurrence", "of"}) into page bboxes.
+
+    Keys without a confident match are left out. Pass ``matcher`` to reuse
+    page pyramids already built for ``page_img``, and ``found`` (a dict filled
+    in by an earlier call with the same page and layers) to reuse its matches.
+    """
+    spec = DEFAULT_LAYERS if spec is None else spec
+    matcher = matcher or PageMatcher(page_img)
+    # (layer, count) -> matches sorted top-to-bottom
+    found = {} if found is None else found
+    bboxes = {}
+    for key, entry in spec.items():
+        layer = entry['layer']
+        if layer not in layers:
+            print(f'[warn] layer not found for {key}: {layer}')
+            continue
+        count = max(entry.get('of', 1), entry.get('occurrence', 0) + 1)
+        if (layer, count) not in found:
+            with slice_trace.span('match_layer', layer=layer, count=count):
+                hits = matcher.match(layers[layer], count)
+            found[(layer, count)] = sorted(hits, key=lambda p: (p[1], p[0]))
+        hits = found[(layer, count)]
+        occurrence = entry.get('occurrence', 0)
+        if occurrence >= len(hits) or hits[occurrence][2] < min_score:
+            print(f'[warn] no confident match for {key} ({layer})')
+            continue
+        x, y, _ = hits[occurrence]
+        w, h = layers[layer].size
+        bboxes[key] = [x, y, w, h]
+    return bboxes
+
+
+def derive_inputs(bboxes: Dict[str, List[int]]) -> Dict[str, List[int]]:
+    inputs = {}
+    for key, (bg, inset) in INPUT_INSET.items():
+        if bg in bboxes:
+            inputs[key] = [v + d for v, d in zip(bboxes[bg], inset)]
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Align interactive_config.json bboxes to the design layers.')
+    parser.add_argument('--page', default=IN_IMG)
+    parser.add_argument('--layers-dir', default=LAYERS_DIR, help='layer zip or unpacked directory')
+    parser.add_argument('--config', default=CFG_PATH)
+    parser.add_argument('--min-score', type=float, default=0.5)
+    parser.add_argument('--write', action='store_true', help='merge the result into the config file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.page):
+        raise FileNotFoundError(args.page)
+    cfg = {}
+    if os.path.exists(args.config):
+        with open(args.config, 'r', encoding='utf-8') as f:
+            cfg = json.load(f)
+    spec = cfg.get('layers', DEFAULT_LAYERS)
+
+    t0 = time.perf_counter()
+    bboxes = align_layers(Image.open(args.page), load_layers(args.layers_dir), spec, args.min_score)
+    elapsed = time.perf_counter() - t0
+    result = {"bboxes": bboxes, "inputs": derive_inputs(bboxes)}
+    print(json.dumps(result, ensure_ascii=False))
+    print(f'Matched {len(bboxes)}/{len(spec)} layers in {elapsed:.3f}s', file=sys.stderr)
+
+    if args.write:
+        cfg.setdefault('bboxes', {}).update(result['bboxes'])
+        cfg.setdefault('inputs', {}).update(result['inputs'])
+        with open(args.config, 'w', encoding='utf-8') as f:
+            json.dump(cfg, f, ensure_ascii=False, indent=2)
+        print(f'Template alignment updated {args.config}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+import os
+
+import batch_slice
+
+
+def test_unique_pages_keep_their_stem():
+    assert batch_slice.page_names(['a/login.png', 'b/home.png']) == {'a/login.png': 'login', 'b/home.png': 'home'}
+
+
+def test_same_file_name_in_two_directories_gets_two_output_dirs():
+    designs = ['UIDESIGN/v1/登录页.png', 'UIDESIGN/v2/登录页.png', 'UIDESIGN/v2/首页.png']
+    names = batch_slice.page_names(designs)
+    assert names == {'UIDESIGN/v1/登录页.png': os.path.join('v1', '登录页'),
+                     'UIDESIGN/v2/登录页.png': os.path.join('v2', '登录页'),
+                     'UIDESIGN/v2/首页.png': '首页'}
+    assert len(set(names.values())) == len(designs)
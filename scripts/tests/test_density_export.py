@@ -0,0 +1,54 @@
+import json
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import build_cache
+import density_export
+import slice_interactive_login
+
+
+def test_parse_sources_forms():
+    sources = density_export.parse_sources(['3=a.png', '@1x=b.png', '4x=c.png'])
+    assert sources == {density_export.BASE_DENSITY: slice_interactive_login.IN_PATH,
+                       3: 'a.png', 1: 'b.png', 4: 'c.png'}
+
+
+def test_parse_sources_at_form_overrides_base():
+    assert density_export.parse_sources(['@2x=page@2x.png'])[2] == 'page@2x.png'
+
+
+def test_scale_bbox_keeps_neighbours_edge_to_edge():
+    left, right = [3, 3, 5, 5], [8, 3, 5, 5]
+    for factor in (0.5, 1.5, 2 / 3):
+        a, b = density_export.scale_bbox(left, factor), density_export.scale_bbox(right, factor)
+        assert a[0] + a[2] == b[0] and a[1] == b[1] and a[3] == b[3]
+    assert density_export.scale_bbox(left, 1.5) == [4, 4, 8, 8]
+
+
+def test_export_clamps_slices_at_the_page_edge(tmp_path):
+    page = tmp_path / 'page@2x.png'
+    Image.fromarray(np.arange(40 * 30 * 3, dtype=np.uint32).reshape(30, 40, 3).astype(np.uint8)).save(page)
+    sources = {2: build_cache.LazySource(str(page))}
+    cache = build_cache.BuildCache(str(tmp_path / 'out'))
+    # "edge" ends exactly on the page edge, "over" runs past it
+    plan = [('edge.png', [30, 20, 10, 10]), ('over.png', [35, 25, 10, 10])]
+    manifest = density_export.export_densities(sources, cache, plan, [1, 2, 3])
+    assert manifest["densities"] == [1, 2]
+    assert manifest["slices"]["over"]["bbox"] == [35, 25, 5, 5]
+    sizes = {f.name: Image.open(f).size for f in (tmp_path / 'out').glob('*@*x.png')}
+    assert sizes == {'edge@1x.png': (5, 5), 'edge@2x.png': (10, 10), 'over@1x.png': (2, 3), 'over@2x.png': (5, 5)}
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node to run the generated module')
+def test_pick_falls_back_to_the_largest_density(tmp_path):
+    manifest = {"base_density": 2, "densities": [1, 2],
+                "slices": {"a": {"bbox": [0, 0, 1, 1], "files": {"1": "/a@1x.png", "2": "/a@2x.png"}}}}
+    module = tmp_path / 'density-assets.js'
+    module.write_text(density_export.density_js(manifest), encoding='utf-8')
+    script = f"const m = require({json.dumps(str(module))}); console.log(JSON.stringify([1, 1.5, 2, 3].map(r => m.pick('a', r))))"
+    out = subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True).stdout
+    assert json.loads(out) == ['/a@1x.png', '/a@2x.png', '/a@2x.png', '/a@2x.png']
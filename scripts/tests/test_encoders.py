@@ -0,0 +1,44 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, features
+
+import encoders
+
+
+def photo(mode='RGB', alpha=255):
+    # smooth gradients plus grain: thousands of colours, compresses well as JPEG
+    yy, xx = np.mgrid[0:96, 0:128]
+    base = np.stack([xx * 2, yy * 2, (xx + yy)], axis=2).astype(np.int16)
+    grain = np.random.default_rng(0).integers(-6, 7, base.shape)
+    rgb = np.clip(base + grain, 0, 255).astype(np.uint8)
+    if mode == 'RGB':
+        return Image.fromarray(rgb)
+    a = np.full((96, 128, 1), 255, dtype=np.uint8)
+    a[:8] = alpha
+    return Image.fromarray(np.concatenate([rgb, a], axis=2), 'RGBA')
+
+
+def test_transparent_slice_never_falls_back_to_jpeg():
+    spec = {"format": "auto", "budget": 8000, "lossy": "jpeg"}
+    data, fmt = encoders.encode(photo('RGBA', alpha=0), spec)
+    assert fmt == ('webp' if features.check('webp') else 'png')
+    assert Image.open(io.BytesIO(data)).mode in ('RGBA', 'LA', 'PA')
+
+
+def test_opaque_alpha_still_falls_back_to_jpeg():
+    _, fmt = encoders.encode(photo('RGBA', alpha=255), {"format": "auto", "budget": 8000, "lossy": "jpeg"})
+    assert fmt == 'jpeg'
+
+
+def test_malformed_lossy_is_rejected():
+    with pytest.raises(ValueError):
+        encoders.resolve_spec({"format": "auto", "lossy": "gif"})
+
+
+def test_before_is_a_default_png_save():
+    image = Image.fromarray(np.tile(np.arange(256, dtype=np.uint8) // 16, (256, 1)) * 16)
+    r = encoders.encode_many([('a.png', image, None)])[0]
+    assert r["before"] == len(encoders._save(image, 'PNG'))
+    assert r["after"] < r["before"]
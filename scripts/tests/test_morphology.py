@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import morphology
+
+SHAPES = [(3, 3), (4, 4), (2, 6), (3, 4), (5, 2), (1, 3)]
+
+
+def brute(image, element, op, fill):
+    # out[y, x] = op over element pixels (ey, ex) of image[y + ey - oy, x + ex - ox], reflected for dilation
+    h, w = image.shape
+    kh, kw = element.shape
+    oy, ox = kh // 2, kw // 2
+    padded = np.full((h + 2 * kh, w + 2 * kw), fill, dtype=image.dtype)
+    padded[kh:kh + h, kw:kw + w] = image
+    out = np.full_like(image, fill)
+    for ey, ex in zip(*np.nonzero(element)):
+        dy, dx = (oy - ey, ox - ex) if op is np.maximum else (ey - oy, ex - ox)
+        out = op(out, padded[kh + dy:kh + dy + h, kw + dx:kw + dx + w])
+    return out
+
+
+def repeated(fn, image, element, n):
+    for _ in range(n):
+        image = fn(image, element)
+    return image
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_single_pass_matches_brute_force(shape):
+    a = np.random.default_rng(0).random((23, 29)) > 0.9
+    se = morphology.structuring_element(shape)
+    assert np.array_equal(morphology.dilate(a, se), brute(a, se, np.maximum, False))
+    assert np.array_equal(morphology.erode(a, se), brute(a, se, np.minimum, True))
+    opened = brute(brute(a, se, np.minimum, True), se, np.maximum, False)
+    closed = brute(brute(a, se, np.maximum, False), se, np.minimum, True)
+    assert np.array_equal(morphology.opening(a, se), opened)
+    assert np.array_equal(morphology.closing(a, se), closed)
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+@pytest.mark.parametrize('n', [2, 3])
+def test_folded_iterations_match_repeated_passes(shape, n):
+    a = np.random.default_rng(n).random((31, 37)) > 0.97
+    se = morphology.structuring_element(shape)
+    dilate, erode = morphology.dilate, morphology.erode
+    assert np.array_equal(dilate(a, se, n), repeated(dilate, a, se, n))
+    assert np.array_equal(erode(a, se, n), repeated(erode, a, se, n))
+    # opening / closing with the element applied n times
+    assert np.array_equal(dilate(erode(a, se, n), se, n), repeated(dilate, repeated(erode, a, se, n), se, n))
+    assert np.array_equal(erode(dilate(a, se, n), se, n), repeated(erode, repeated(dilate, a, se, n), se, n))
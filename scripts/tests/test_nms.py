@@ -0,0 +1,73 @@
+import math
+
+import numpy as np
+import pytest
+
+import nms
+
+
+def iou(a, b):
+    inter = overlap(a, b)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def overlap(a, b):
+    iw = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    ih = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    return iw * ih
+
+
+def reference(boxes, iou_threshold, mode, containment=0.9):
+    # the loop nms.suppress replaced: largest first, compare against every kept box
+    selected = []
+    for b in sorted(boxes, key=lambda b: b[2] * b[3], reverse=True):
+        if all(iou(b, s) <= iou_threshold and
+               (mode == 'greedy' or overlap(b, s) / (b[2] * b[3]) < containment) for s in selected):
+            selected.append(b)
+    return selected
+
+
+def reference_soft(boxes, sigma=0.5, score_threshold=0.3):
+    # highest score first (ties: larger, then earlier); every other box decays by its IoU with it
+    rank = {k: r for r, k in enumerate(sorted(range(len(boxes)), key=lambda k: -boxes[k][2] * boxes[k][3]))}
+    score = [1.0] * len(boxes)
+    left = set(range(len(boxes)))
+    out = []
+    while left:
+        k = min(left, key=lambda k: (-score[k], rank[k]))
+        left.discard(k)
+        if score[k] < score_threshold:
+            continue
+        out.append(boxes[k])
+        for c in left:
+            o = iou(boxes[k], boxes[c])
+            if o > 0:
+                score[c] *= math.exp(-(o * o) / sigma)
+    return out
+
+
+def random_boxes(seed, n=60):
+    rng = np.random.default_rng(seed)
+    boxes = [tuple(int(v) for v in (*rng.integers(0, 80, 2), *rng.integers(1, 40, 2))) for _ in range(n)]
+    # exact duplicates and equal areas exercise the tie order
+    return boxes + boxes[:5] + [(b[0] + 1, b[1], b[2], b[3]) for b in boxes[5:10]]
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('mode', ['greedy', 'containment'])
+@pytest.mark.parametrize('threshold', [0.3, 0.9])
+def test_greedy_modes_match_the_quadratic_loop(seed, mode, threshold):
+    boxes = random_boxes(seed)
+    assert nms.suppress(boxes, threshold, mode) == reference(boxes, threshold, mode)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_soft_matches_naive_soft_nms(seed):
+    boxes = random_boxes(seed, n=30)
+    assert nms.suppress(boxes, mode='soft') == reference_soft(boxes)
+
+
+def test_empty_and_single():
+    assert nms.suppress([]) == []
+    assert nms.suppress([(1, 2, 3, 4)]) == [(1, 2, 3, 4)]
@@ -0,0 +1,32 @@
+import threading
+import time
+
+import slice_daemon
+
+
+def test_layer_matches_are_re_measured_after_they_grow():
+    cache = slice_daemon.LRUCache(1 << 20)
+    found = cache.get('m', slice_daemon.LayerMatches)
+    empty = cache.bytes
+    with found.lock:
+        found[('圆角矩形 7', 2)] = [(68, 764, 0.98), (68, 945, 0.97)]
+    cache.resize('m')
+    assert cache.bytes > empty
+
+
+def test_concurrent_misses_compute_once():
+    cache = slice_daemon.LRUCache(1 << 20)
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return 42
+
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(cache.get('k', slow))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert got == [42] * 4 and len(calls) == 1 and cache.misses == 1
@@ -0,0 +1,100 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+import slice_login
+
+
+def flood_labels(binary):
+    # reference: 8-connected flood fill, components numbered in raster order of their first pixel
+    h, w = binary.shape
+    labels = np.full((h, w), -1, dtype=np.int64)
+    n = 0
+    for y, x in zip(*np.nonzero(binary)):
+        if labels[y, x] >= 0:
+            continue
+        labels[y, x] = n
+        queue = deque([(y, x)])
+        while queue:
+            cy, cx = queue.popleft()
+            for ny in range(max(0, cy - 1), min(h, cy + 2)):
+                for nx in range(max(0, cx - 1), min(w, cx + 2)):
+                    if binary[ny, nx] and labels[ny, nx] < 0:
+                        labels[ny, nx] = n
+                        queue.append((ny, nx))
+        n += 1
+    return labels, n
+
+
+def flood_stats(binary):
+    labels, n = flood_labels(binary)
+    boxes, counts, centroids = [], [], []
+    for k in range(n):
+        ys, xs = np.nonzero(labels == k)
+        boxes.append([xs.min(), ys.min(), xs.max() - xs.min() + 1, ys.max() - ys.min() + 1])
+        counts.append(len(xs))
+        centroids.append([xs.mean(), ys.mean()])
+    return np.array(boxes, dtype=np.int64).reshape(-1, 4), np.array(counts), np.array(centroids).reshape(-1, 2)
+
+
+def random_masks():
+    rng = np.random.default_rng(7)
+    yield np.zeros((5, 7), dtype=np.uint8)
+    yield np.ones((6, 9), dtype=np.uint8)
+    for density in (0.2, 0.45, 0.6):
+        for shape in ((1, 40), (40, 1), (23, 31)):
+            yield (rng.random(shape) < density).astype(np.uint8)
+
+
+@pytest.mark.parametrize('binary', list(random_masks()))
+def test_run_labels_match_flood_fill(binary):
+    rows, starts, ends, label, first = slice_login._label_runs(binary)
+    labels, n = flood_labels(binary)
+    assert len(first) == n
+    for r, s, e, k in zip(rows, starts, ends, label):
+        assert (labels[r, s:e] == k).all()
+
+
+@pytest.mark.parametrize('binary', list(random_masks()))
+def test_component_stats_match_flood_fill(binary):
+    stats = slice_login._label_components(binary)
+    boxes, counts, centroids = flood_stats(binary)
+    assert np.array_equal(stats["boxes"], boxes)
+    assert np.array_equal(stats["counts"], counts)
+    assert np.allclose(stats["centroids"], centroids)
+
+
+def page(h=96, w=72, seed=3):
+    # flat panels on a grainy background: components span several strips
+    rng = np.random.default_rng(seed)
+    img = rng.integers(200, 215, (h, w, 3)).astype(np.uint8)
+    for _ in range(12):
+        y, x = rng.integers(0, h - 4), rng.integers(0, w - 4)
+        ph, pw = rng.integers(3, h // 2), rng.integers(3, w // 2)
+        img[y:y + ph, x:x + pw] = rng.integers(0, 256, 3)
+    return img
+
+
+@pytest.mark.parametrize('strip_height', [1, 7, 16, 40])
+@pytest.mark.parametrize('noise', [False, True])
+def test_tiled_threshold_is_the_full_frame_percentile(strip_height, noise):
+    # noise: nearly every magnitude distinct, so both histogram passes matter
+    img = np.random.default_rng(5).integers(0, 256, (83, 61, 3)).astype(np.uint8) if noise else page()
+    full = np.percentile(slice_login._sobel_magnitude(slice_login._to_gray(img)), slice_login.EDGE_PERCENTILE)
+    assert slice_login._tiled_threshold(img, strip_height) == full
+
+
+@pytest.mark.parametrize('strip_height', [1, 7, 16, 40])
+@pytest.mark.parametrize('element_size, element_shape', [(3, 'rect'), ((4, 2), 'rect'), (5, 'ellipse')])
+def test_tiled_components_match_full_frame(strip_height, element_size, element_shape):
+    img = page()
+    element = slice_login.morphology.structuring_element(element_size, element_shape)
+    edges = slice_login._edges_binary(slice_login._to_gray(img))
+    boxes, counts, centroids = flood_stats(slice_login.morphology.dilate(edges, element))
+    tiled = slice_login.component_stats(img, element_size, element_shape, strip_height=strip_height)
+    assert np.array_equal(tiled["boxes"], boxes)
+    assert np.array_equal(tiled["counts"], counts)
+    assert np.allclose(tiled["centroids"], centroids)
+    # some component really crosses a strip boundary
+    assert strip_height == 40 or (boxes[:, 3] > strip_height).any()
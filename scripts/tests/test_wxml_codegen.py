@@ -0,0 +1,62 @@
+import slice_custom_login
+import slice_interactive_login
+import wxml_codegen
+
+
+def render(text, module, body='    <view/>\n'):
+    return wxml_codegen.update_wxml(text, body, **module.CANVAS)
+
+
+def test_canvas_follows_the_variant_on_every_run():
+    page = render('', slice_custom_login)
+    page = render(page, slice_interactive_login)
+    assert f'class="{slice_interactive_login.CANVAS["canvas_class"]}"' in page
+    assert f'style="{slice_interactive_login.CANVAS["canvas_style"]}"' in page
+    page = render(page, slice_custom_login)
+    assert page == render('', slice_custom_login)
+
+
+HAND_PAGE = '''<view class="page login-page">
+  <view class="custom-navbar" style="padding-top: {{statusBarHeight}}px;">
+    <view class="nav-title">登录</view>
+  </view>
+
+  <view class="design-canvas {{debug?'debug':''}}" style="width: 100vw;">
+    <image class="slice" src="/assets/login/top_area.png"/>
+    <view class="abs-rect"></view>
+  </view>
+</view>
+'''
+
+
+def test_page_without_markers_is_left_alone():
+    assert render(HAND_PAGE, slice_interactive_login) == HAND_PAGE
+
+
+def test_init_adopts_the_design_canvas():
+    body = '    <view class="generated"></view>\n'
+    page = wxml_codegen.update_wxml(HAND_PAGE, body, init=True, **slice_interactive_login.CANVAS)
+    assert 'class="custom-navbar"' in page and 'top_area.png' not in page
+    assert wxml_codegen.splice('wxml', page, body) == page
+    assert page.endswith('''    <!-- generated:login-slices end -->
+  </view>
+</view>
+''')
+    # from here on the page has markers and regenerates without init
+    assert render(page, slice_interactive_login, body) == page
+
+
+def old_append(base, additions):
+    # what slice_interactive_login.py did before the marked region
+    return base + ('\n' if base and not base.endswith('\n') else '') + additions
+
+
+def test_wxss_grown_by_older_runs_is_cleaned_up():
+    hand = ('/* 设计画布与切片 */\n.design-canvas { position: relative; margin: 0 auto; overflow: hidden; }\n'
+            '.slice { position: absolute; pointer-events: none; }\n.page { padding: 0; }')
+    original, = slice_interactive_login.LEGACY_WXSS
+    grown = old_append(old_append(old_append(hand, original), original), original)
+    css = slice_interactive_login.render_wxss(grown)
+    assert css == wxml_codegen.update_wxss(hand, slice_interactive_login.WXSS_ADDITIONS)
+    assert css.startswith(hand + '\n\n/* generated:login-slices begin */\n')
+    assert slice_interactive_login.render_wxss(css) == css
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Check generated slice layouts against the source design, without eyeballing audit.png.
+
+Each manifest (``*_slices.json``) is recomposited: every slice image (or its
+atlas region) is pasted at its bbox onto a canvas the size of the design.
+Canvas and design are then compared in ``--tile``-sized tiles, all at once
+through block reshapes: per-tile SSIM of the grey level and mean absolute
+RGB difference. Pixels no slice covers are taken from the design, so only
+sliced areas can fail.
+
+A failing tile is blamed on the slices whose own (topmost) pixels in it
+differ from the design. For each blamed slice, the offset at which it does
+match the design is searched within ``--radius`` px through FFT
+cross-correlation, so the report tells how far it is off, not just that it
+is. ``inputs`` rects that fall outside every slice are reported too. Exits 1
+when anything is misaligned.
+
+Usage: python3 scripts/verify_layout.py [manifest.json ...] [--tile 32] [--json report.json]
+"""
+import os
+import sys
+import glob
+import json
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+import build_cache
+from region_stats import integral
+from slice_assets import clamp_bbox
+
+OUT_DIR = os.path.join('miniprogram', 'assets', 'login')
+TILE = 32
+MIN_SSIM = 0.9
+MAX_DIFF = 6.0  # mean abs RGB difference; leaves room for lossy-encoded slices
+RADIUS = 8
+# SSIM constants for 8-bit images (K1 = 0.01, K2 = 0.03)
+C1 = (0.01 * 255) ** 2
+C2 = (0.03 * 255) ** 2
+
+
+def _gray(rgb: np.ndarray) -> np.ndarray:
+    return rgb[..., 0] * 0.299 + rgb[..., 1] * 0.587 + rgb[..., 2] * 0.114
+
+
+def load_manifest(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def slice_images(manifest: dict, base: str):
+    """(meta, RGB image) for every non-empty slice, read from its file or its atlas region."""
+    atlas = None
+    if manifest.get('atlas'):
+        atlas = Image.open(os.path.join(base, manifest['atlas']['name'])).convert('RGB')
+    for m in manifest.get('slices', []):
+        x, y, w, h = m['bbox']
+        if w <= 0 or h <= 0:
+            continue
+        if 'atlas' in m and atlas is not None:
+            ax, ay = m['atlas']
+            yield m, atlas.crop((ax, ay, ax + w, ay + h))
+        else:
+            yield m, Image.open(os.path.join(base, m.get('src', m['name']))).convert('RGB')
+
+
+def composite(manifest: dict, base: str, design: np.ndarray) -> Tuple[np.ndarray, np.ndarray, List[dict], List[str]]:
+    """Canvas with every slice pasted at its bbox, the index of the slice owning each pixel (-1: none)."""
+    H, W = design.shape[:2]
+    canvas = design.copy()
+    owner = np.full((H, W), -1, dtype=np.int32)
+    metas = []
+    problems = []
+    for m, img in slice_images(manifest, base):
+        x, y, w, h = m['bbox']
+        if img.size != (w, h):
+            problems.append(f'{m["name"]}: image is {img.size[0]}x{img.size[1]}, bbox is {w}x{h}')
+        x1, y1, x2, y2 = clamp_bbox(W, H, x, y, min(w, img.width), min(h, img.height))
+        canvas[y1:y2, x1:x2] = np.asarray(img)[y1 - y:y2 - y, x1 - x:x2 - x]
+        owner[y1:y2, x1:x2] = len(metas)
+        metas.append(m)
+    return canvas, owner, metas, problems
+
+
+def _tiles(a: np.ndarray, tile: int) -> np.ndarray:
+    # (ty, tx, tile*tile[, c]) view of ``a`` padded by edge replication to whole tiles
+    h, w = a.shape[:2]
+    ph, pw = -h % tile, -w % tile
+    if ph or pw:
+        a = np.pad(a, ((0, ph), (0, pw)) + ((0, 0),) * (a.ndim - 2), mode='edge')
+    ty, tx = a.shape[0] // tile, a.shape[1] // tile
+    t = a.reshape((ty, tile, tx, tile) + a.shape[2:]).swapaxes(1, 2)
+    return t.reshape((ty, tx, tile * tile) + a.shape[2:])
+
+
+def tile_scores(canvas: np.ndarray, design: np.ndarray, tile: int = TILE) -> Dict[str, np.ndarray]:
+    """Per-tile SSIM (grey) and mean absolute RGB difference."""
+    a = _tiles(_gray(canvas.astype(np.float64)), tile)
+    b = _tiles(_gray(design.astype(np.float64)), tile)
+    ma, mb = a.mean(axis=2), b.mean(axis=2)
+    va, vb = a.var(axis=2), b.var(axis=2)
+    cov = (a * b).mean(axis=2) - ma * mb
+    ssim = ((2 * ma * mb + C1) * (2 * cov + C2)) / ((ma * ma + mb * mb + C1) * (va + vb + C2))
+    diff = np.abs(canvas.astype(np.int16) - design.astype(np.int16)).mean(axis=2)
+    return {"ssim": ssim, "diff": _tiles(diff, tile).mean(axis=2), "pixel_diff": diff}
+
+
+def estimate_offset(design_gray: np.ndarray, slice_gray: np.ndarray, x: int, y: int,
+                    radius: int = RADIUS) -> Tuple[int, int, float]:
+    """(dx, dy, rms) shift within ``radius`` where the slice best matches the design (least squares)."""
+    h, w = slice_gray.shape
+    padded = np.pad(design_gray, radius, mode='edge')
+    H, W = design_gray.shape
+    x0, y0 = min(max(x, 0), W), min(max(y, 0), H)
+    win = padded[y0:y0 + h + 2 * radius, x0:x0 + w + 2 * radius]
+    if win.shape != (h + 2 * radius, w + 2 * radius):
+        return 0, 0, float('nan')
+    shape = win.shape
+    corr = np.fft.irfft2(np.fft.rfft2(win) * np.conj(np.fft.rfft2(slice_gray, shape)), shape)
+    n = 2 * radius + 1
+    corr = corr[:n, :n]
+    sq = integral(win * win)
+    win_sq = sq[h:h + n, w:w + n] - sq[:n, w:w + n] - sq[h:h + n, :n] + sq[:n, :n]
+    ssd = win_sq - 2 * corr + (slice_gray * slice_gray).sum()
+    # flat slices match at many shifts; prefer the smallest one among the best
+    ys, xs = np.nonzero(ssd <= ssd.min() + 1e-6 * max(abs(ssd.min()), 1.0))
+    k = np.argmin((ys - radius) ** 2 + (xs - radius) ** 2)
+    dy, dx = ys[k], xs[k]
+    return int(dx) - radius, int(dy) - radius, float(np.sqrt(max(ssd[dy, dx], 0.0) / (h * w)))
+
+
+def verify(manifest_path: str, design_path: str = None, tile: int = TILE, min_ssim: float = MIN_SSIM,
+           max_diff: float = MAX_DIFF, radius: int = RADIUS) -> dict:
+    manifest = load_manifest(manifest_path)
+    design_path = design_path or manifest['input']
+    design = np.asarray(Image.open(design_path).convert('RGB'))
+    canvas, owner, metas, problems = composite(manifest, os.path.dirname(manifest_path), design)
+    scores = tile_scores(canvas, design, tile)
+    bad = (scores["ssim"] < min_ssim) | (scores["diff"] > max_diff)
+
+    H, W = design.shape[:2]
+    design_gray = _gray(design.astype(np.float64))
+    diff = scores["pixel_diff"]
+    owner_tiles = _tiles(owner, tile)
+    diff_tiles = _tiles(diff, tile)
+    own_diff = []
+    for k in range(len(metas)):
+        mine = owner_tiles == k
+        own_diff.append(np.where(mine, diff_tiles, 0).sum(axis=2) / np.maximum(mine.sum(axis=2), 1)
+                        * mine.any(axis=2))
+    own_diff = np.stack(own_diff) if metas else np.zeros((0,) + bad.shape)
+    # a failing tile is blamed on the slices whose own pixels there differ, or, for an
+    # SSIM-only failure, on the one differing most
+    blame = (own_diff > max_diff) & bad
+    if len(metas):
+        blame[np.argmax(own_diff, axis=0), np.arange(bad.shape[0])[:, None], np.arange(bad.shape[1])] |= \
+            bad & ~blame.any(axis=0) & (own_diff.max(axis=0) > 0)
+
+    regions = []
+    for k, m in enumerate(metas):
+        rows, cols = np.nonzero(blame[k])
+        if not len(rows):
+            continue
+        x1, y1, x2, y2 = clamp_bbox(W, H, *m['bbox'])
+        dx, dy, rms = estimate_offset(design_gray, _gray(canvas[y1:y2, x1:x2].astype(np.float64)), x1, y1, radius)
+        regions.append({
+            "name": m['name'],
+            "bbox": m['bbox'],
+            "tiles": int(len(rows)),
+            "region": [int(cols.min()) * tile, int(rows.min()) * tile,
+                       int(cols.max() - cols.min() + 1) * tile, int(rows.max() - rows.min() + 1) * tile],
+            "min_ssim": round(float(scores["ssim"][rows, cols].min()), 4),
+            "max_diff": round(float(own_diff[k][rows, cols].max()), 2),
+            "offset": [dx, dy],
+            "rms_at_offset": round(rms, 2),
+        })
+
+    for key, rect in manifest.get('inputs', {}).items():
+        x1, y1, x2, y2 = clamp_bbox(W, H, *rect)
+        if x2 <= x1 or y2 <= y1 or (owner[y1:y2, x1:x2] < 0).any():
+            problems.append(f'input {key} {rect} is not fully backed by a slice')
+
+    return {"manifest": manifest_path, "design": design_path, "tiles": int(bad.size), "bad_tiles": int(bad.sum()),
+            "mean_ssim": round(float(scores["ssim"].mean()), 4), "regions": regions, "problems": problems}
+
+
+def default_manifests() -> List[str]:
+    return sorted(p for p in glob.glob(os.path.join(OUT_DIR, '*_slices.json'))
+                  if 'slices' in load_manifest(p) and 'input' in load_manifest(p))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare recomposited slice layouts with the source design.')
+    parser.add_argument('manifests', nargs='*', help=f'slice manifests (default: {OUT_DIR}/*_slices.json)')
+    parser.add_argument('--design', help="source design (default: each manifest's \"input\")")
+    parser.add_argument('--tile', type=int, default=TILE)
+    parser.add_argument('--min-ssim', type=float, default=MIN_SSIM)
+    parser.add_argument('--max-diff', type=float, default=MAX_DIFF, help='mean abs RGB difference per tile')
+    parser.add_argument('--radius', type=int, default=RADIUS, help='offset search radius (px)')
+    parser.add_argument('--json', help='also write the full report here')
+    args = parser.parse_args()
+
+    manifests = args.manifests or default_manifests()
+    if not manifests:
+        print('No slice manifests found')
+        sys.exit(2)
+    reports = []
+    for path in manifests:
+        r = verify(path, args.design, args.tile, args.min_ssim, args.max_diff, args.radius)
+        reports.append(r)
+        status = 'OK' if not r['regions'] and not r['problems'] else 'MISALIGNED'
+        print(f'{status:<10} {path}: {r["bad_tiles"]}/{r["tiles"]} tiles off, mean SSIM {r["mean_ssim"]}')
+        for g in r['regions']:
+            print(f'  {g["name"]:<24} bbox {g["bbox"]} region {g["region"]} ssim {g["min_ssim"]} '
+                  f'diff {g["max_diff"]} -> offset {g["offset"]} (rms {g["rms_at_offset"]})')
+        for p in r['problems']:
+            print(f'  {p}')
+    if args.json:
+        build_cache.write_text_if_changed(args.json, json.dumps(reports, ensure_ascii=False, indent=2) + '\n')
+    if any(r['regions'] or r['problems'] for r in reports):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
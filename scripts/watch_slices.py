@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Watch the slice configs and design images and regenerate on change.
+
+Runs the pipeline from ``pipeline_config.json`` once, then polls every file
+the stages read (configs, source images, the pipeline config itself). After
+a change settles for ``--debounce`` seconds, only the stages reading the
+changed files run again (plus the WXML of any re-cropped variant), with the
+decoded design kept in memory between runs. The build cache still skips
+every slice whose bbox did not change, so a single bbox edit re-encodes one
+slice, the overlay and the WXML.
+
+Assets are encoded with the fast preview settings (``"optimize": false``)
+unless ``--full-encode`` is given; run slice_pipeline.py for release assets.
+
+Usage: python3 scripts/watch_slices.py [config.json] [--debounce 0.05]
+"""
+import os
+import sys
+import time
+import copy
+import argparse
+
+import slice_pipeline
+
+POLL_INTERVAL = 0.02
+
+
+def fast_encode(encode):
+    encode = copy.deepcopy(encode) or {}
+    encode.setdefault('default', {})['optimize'] = False
+    for spec in encode.get('assets', {}).values():
+        spec['optimize'] = False
+    return encode
+
+
+def watched_files(cfg: dict, config_path: str) -> set:
+    paths = {config_path}
+    for spec in cfg.get('stages', []):
+        paths |= slice_pipeline.stage_inputs(cfg, spec)
+    return paths
+
+
+def snapshot(paths) -> dict:
+    out = {}
+    for p in paths:
+        try:
+            st = os.stat(p)
+            out[p] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            out[p] = None
+    return out
+
+
+def wait_for_change(paths, last: dict, debounce: float) -> dict:
+    """Block until some file differs from ``last`` and then stays put for ``debounce`` seconds."""
+    while True:
+        time.sleep(POLL_INTERVAL)
+        cur = snapshot(paths)
+        if cur != last:
+            break
+    while True:
+        time.sleep(debounce)
+        settled = snapshot(paths)
+        if settled == cur:
+            return cur
+        cur = settled
+
+
+class Watcher:
+    def __init__(self, config_path: str, full_encode: bool = False):
+        self.config_path = config_path
+        self.full_encode = full_encode
+        self.ctx = None
+        self.cfg = None
+
+    def load(self):
+        cfg = slice_pipeline.load_pipeline(self.config_path)
+        if not self.full_encode:
+            cfg['encode'] = fast_encode(cfg.get('encode'))
+        old = self.ctx
+        self.cfg = cfg
+        self.ctx = slice_pipeline.PipelineContext(cfg)
+        if old is not None:
+            # keep already decoded designs across config reloads
+            self.ctx.sources.update(old.sources)
+
+    def preload(self):
+        for spec in self.cfg.get('stages', []):
+            if 'source' in spec:
+                self.ctx.source(spec['source']).image
+
+    def run(self, specs):
+        t0 = time.perf_counter()
+        self.ctx.pending = {}
+        written0, skipped0 = self.ctx.cache.written, self.ctx.cache.skipped
+        slice_pipeline.run_stages(self.ctx, specs)
+        files = self.ctx.flush()
+        kinds = ', '.join(s['type'] + (f":{s['variant']}" if s.get('variant') else '') for s in specs)
+        print(f'[{time.strftime("%H:%M:%S")}] {kinds or "nothing"} in {(time.perf_counter() - t0) * 1000:.0f} ms: '
+              f'{self.ctx.cache.written - written0} asset(s) written, {self.ctx.cache.skipped - skipped0} up to date, '
+              f'{files} text file(s) changed', flush=True)
+
+    def on_change(self, changed: set):
+        if self.config_path in changed:
+            self.load()
+            self.run(self.cfg.get('stages', []))
+            return
+        self.ctx.forget(changed)
+        self.run(slice_pipeline.affected_stages(self.cfg, changed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regenerate slices when configs or designs change.')
+    parser.add_argument('config', nargs='?', default=slice_pipeline.DEFAULT_CONFIG)
+    parser.add_argument('--debounce', type=float, default=0.05, help='quiet period before regenerating (s)')
+    parser.add_argument('--full-encode', action='store_true', help='use the configured encoders instead of fast preview PNGs')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.config):
+        print(f'Config not found: {args.config}')
+        sys.exit(2)
+    watcher = Watcher(args.config, args.full_encode)
+    watcher.load()
+    watcher.run(watcher.cfg.get('stages', []))
+    watcher.preload()
+    paths = watched_files(watcher.cfg, args.config)
+    last = snapshot(paths)
+    print(f'Watching {len(paths)} file(s); Ctrl-C to stop', flush=True)
+    try:
+        while True:
+            cur = wait_for_change(paths, last, args.debounce)
+            changed = {p for p in paths if cur.get(p) != last.get(p)}
+            last = cur
+            if any(cur[p] is None for p in changed):
+                # mid-save (file replaced); the next change event picks it up
+                continue
+            try:
+                watcher.on_change(changed)
+            except Exception as e:
+                print(f'[error] {type(e).__name__}: {e}', flush=True)
+            if args.config in changed:
+                paths = watched_files(watcher.cfg, args.config)
+                last = snapshot(paths)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
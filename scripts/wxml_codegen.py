@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Template-based WXML/WXSS generation for the login page variants.
+
+Element markup comes from ``string.Template`` objects built once at import;
+the variant scripts only fill in names and rects. Generated markup lives
+between marker comments:
+
+    <!-- generated:login-slices begin -->
+    ...
+    <!-- generated:login-slices end -->
+
+(``/* ... */`` in WXSS). Only that region is replaced, so hand edits around
+it (navigation bar, extra styles) survive regeneration; the class and style
+of the enclosing ``design-canvas`` view are set to the variant's own. A WXML
+page without the markers is left alone unless ``init`` is given (``--init``
+in the scripts): then the design-canvas children become the region. A
+missing page is created from ``PAGE``. A WXSS file without the markers gets
+the region appended, and every copy of the blocks older runs appended
+unmarked (``legacy``) is removed, so the stylesheet no longer grows on
+every run. Writes go through ``write_text_if_changed``, so unchanged output
+leaves the file untouched.
+"""
+import os
+import re
+from typing import Iterable
+from string import Template
+
+import build_cache
+
+REGION = 'login-slices'
+# canvas of the pages laid out in design pixels and scaled to the screen
+CANVAS = {"canvas_class": "design-canvas", "canvas_style": "transform: scale({{designScale}}); transform-origin: left top;"}
+
+PAGE = Template('''<view class="page login-page">
+  <view class="${canvas_class}" style="${canvas_style}">
+${region}
+  </view>
+</view>
+''')
+DESIGN_BG = Template('<image class="slice design-bg" src="/assets/login/${src}" style="${style}"/>')
+SLICE = Template('<image class="slice" src="/assets/login/${src}" style="${style}"/>')
+ATLAS_SLICE = Template('''<view class="slice atlas-slice" style="${style}">
+  <image class="atlas-img" src="/assets/login/${atlas}" style="${atlas_style}"/>
+</view>''')
+INPUT = Template('<input class="abs-input" style="${style}" placeholder="${placeholder}"${extra} bindinput="onInput" data-field="${field}"/>')
+BUTTON = Template('<view class="btn ${cls}" style="${style}" bindtap="${tap}"></view>')
+CHECKBOX = Template('''<view class="agree-box" style="${style}" bindtap="toggleAgree">
+  <view class="agree-inner {{agree?'on':''}}"></view>
+</view>''')
+
+_COMMENT = {'wxml': ('<!--', '-->'), 'wxss': ('/*', '*/')}
+_CANVAS_OPEN = re.compile(r'<view\s[^>]*?\bclass="design-canvas\b[^"]*"[^>]*>')
+_VIEW_TAG = re.compile(r'</view\s*>|<view\b[^>]*?(/?)>')
+
+
+def style_rect(x, y, w, h) -> str:
+    return f'left:{x}px; top:{y}px; width:{w}px; height:{h}px'
+
+
+def indent(blocks, spaces: int = 4) -> str:
+    """Join rendered elements, indenting every line by ``spaces``."""
+    pad = ' ' * spaces
+    return '\n'.join(pad + line for block in blocks for line in block.split('\n'))
+
+
+def slice_elements(meta, atlas: dict = None):
+    for s in meta:
+        x, y, w, h = s['bbox']
+        if atlas and 'atlas' in s:
+            # clip the shared atlas image to this slice's sub-rect
+            ax, ay = s['atlas']
+            aw, ah = atlas['size']
+            yield ATLAS_SLICE.substitute(style=style_rect(x, y, w, h), atlas=atlas['name'],
+                                         atlas_style=style_rect(-ax, -ay, aw, ah))
+        else:
+            # "src": shared file when dedup_slices folded this slice
+            yield SLICE.substitute(src=s.get('src', s['name']), style=style_rect(x, y, w, h))
+
+
+def button_elements(meta, buttons):
+    """Tap overlays for ``buttons`` ((slice name, css class, handler) triples) present in ``meta``."""
+    by_name = {s['name']: s['bbox'] for s in meta}
+    for name, cls, tap in buttons:
+        if name in by_name:
+            yield BUTTON.substitute(cls=cls, style=style_rect(*by_name[name]), tap=tap)
+
+
+def _markers(kind: str, region: str):
+    open_, close = _COMMENT[kind]
+    return f'{open_} generated:{region} begin {close}', f'{open_} generated:{region} end {close}'
+
+
+def _region_re(kind: str, region: str):
+    begin, end = _markers(kind, region)
+    return re.compile(rf'^([ \t]*){re.escape(begin)}\n.*?^[ \t]*{re.escape(end)}[ \t]*$', re.M | re.S)
+
+
+def wrap(kind: str, body: str, region: str = REGION, pad: str = '') -> str:
+    begin, end = _markers(kind, region)
+    body = body.rstrip('\n')
+    return f'{pad}{begin}\n' + (body + '\n' if body else '') + f'{pad}{end}'
+
+
+def splice(kind: str, text: str, body: str, region: str = REGION):
+    """``text`` with its generated region replaced by ``body``, or None without markers."""
+    pattern = _region_re(kind, region)
+    m = pattern.search(text)
+    if not m:
+        return None
+    return text[:m.start()] + wrap(kind, body, region, m.group(1)) + text[m.end():]
+
+
+def _canvas_open(text: str, end: int):
+    """Match of the last design-canvas open tag before ``end``, or None."""
+    found = None
+    for m in _CANVAS_OPEN.finditer(text, 0, end):
+        found = m
+    return found
+
+
+def set_canvas(text: str, before: int, canvas_class: str, canvas_style: str) -> str:
+    """``text`` with the class and style of the design canvas enclosing offset ``before`` replaced."""
+    m = _canvas_open(text, before)
+    if m is None:
+        return text
+    tag = re.sub(r'\sclass="[^"]*"', lambda _: f' class="{canvas_class}"', m.group(0), count=1)
+    if re.search(r'\sstyle="[^"]*"', tag):
+        tag = re.sub(r'\sstyle="[^"]*"', lambda _: f' style="{canvas_style}"', tag, count=1)
+    else:
+        tag = tag[:-1] + f' style="{canvas_style}">'
+    return text[:m.start()] + tag + text[m.end():]
+
+
+def _view_close(text: str, start: int):
+    """Offset of the ``</view>`` closing the view whose open tag ends at ``start``, or None."""
+    depth = 1
+    for m in _VIEW_TAG.finditer(text, start):
+        if m.group(0).startswith('</'):
+            depth -= 1
+        elif not m.group(1):
+            depth += 1
+        if depth == 0:
+            return m.start()
+    return None
+
+
+def update_wxml(text: str, body: str, canvas_class: str, canvas_style: str, region: str = REGION,
+                init: bool = False) -> str:
+    spliced = splice('wxml', text, body, region)
+    if spliced is not None:
+        # the canvas wrapper sits outside the region, but its size and scale belong to the
+        # variant that rendered the region, so it is rewritten on every run as well
+        return set_canvas(spliced, _region_re('wxml', region).search(spliced).start(), canvas_class, canvas_style)
+    if text.strip() and not init:
+        # a hand-written page (custom navbar etc.): never replace it implicitly
+        print(f'[warn] page has no generated:{region} markers; left unchanged (--init adopts its design-canvas)')
+        return text
+    canvas = _canvas_open(text, len(text)) if text.strip() else None
+    close = _view_close(text, canvas.end()) if canvas else None
+    if close is None:
+        return PAGE.substitute(canvas_class=canvas_class, canvas_style=canvas_style,
+                               region=wrap('wxml', body, region, '    '))
+    # the canvas's children become the region; everything around the canvas is kept
+    pad = text[text.rfind('\n', 0, close) + 1:close]
+    text = text[:canvas.end()] + '\n' + wrap('wxml', body, region, pad + '  ') + '\n' + pad + text[close:]
+    return set_canvas(text, canvas.end(), canvas_class, canvas_style)
+
+
+def update_wxss(text: str, css: str, region: str = REGION, legacy: Iterable[str] = ()) -> str:
+    css = css.strip('\n')
+    spliced = splice('wxss', text, css, region)
+    if spliced is not None:
+        return spliced
+    for block in legacy:
+        # copies appended unmarked by earlier runs
+        block = block.strip()
+        if block:
+            text = text.replace(block + '\n', '').replace(block, '')
+    text = text.rstrip('\n')
+    return (text + '\n\n' if text else '') + wrap('wxss', css, region) + '\n'
+
+
+def read(path: str) -> str:
+    if not os.path.exists(path):
+        return ''
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def write_wxml(path: str, body: str, canvas_class: str, canvas_style: str, region: str = REGION,
+               init: bool = False) -> bool:
+    return build_cache.write_text_if_changed(path, update_wxml(read(path), body, canvas_class, canvas_style,
+                                                               region, init))
+
+
+def write_wxss(path: str, css: str, region: str = REGION, legacy: Iterable[str] = ()) -> bool:
+    return build_cache.write_text_if_changed(path, update_wxss(read(path), css, region, legacy))